@@ -0,0 +1,993 @@
+"""
+    Headless benchmarks for the 3D Game
+"""
+################ Benchmarks ###################################################
+#region
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+from typing import Callable, Iterator
+
+import numpy as np
+
+import prototype
+from prototype import Camera, GameView, HeadlessCanvas, LevelData, MapView, Scene
+#endregion
+################ Constants     ################################################
+#region
+#(spin, move) per frame
+camera_step = tuple[float, float]
+
+DEFAULT_FRAMES = 360
+#room grid sides for the loading benchmark, 10 by 10 sectors per room
+LOAD_SIZES = (3, 10, 32)
+LOAD_ROOM_SIZE = 10
+#streaming benchmark: walk east through a row of this many rooms
+STREAM_SIZE = 32
+STREAM_BUDGETS = (None, 1000)
+STREAM_STEP = 8
+#frames spent stepping back and forth at a door
+ROOM_JITTER_FRAMES = 100
+#entity benchmark: drakes spread over this many sectors, 
+# and how many sectors a frame looks at
+ENTITY_COUNTS = (1000, 100000)
+ENTITY_SECTORS = 10000
+ENTITY_QUERY_SECTORS = 200
+#level of detail benchmark: extra drakes packed into one big room
+CROWD_SIZES = (0, 100, 1000)
+CROWD_ROOM_SIZE = 20
+#movement benchmark: agents walking about a grid of rooms with the 
+# doors shut, at a walk and fast enough to need several steps a tick
+AGENT_COUNTS = (1000, 10000, 100000)
+AGENT_ROOMS = 8
+AGENT_SPEEDS = (2, 100)
+AGENT_TICKS = 60
+#drake AI benchmark: crowds in one big room, thinking without a 
+# time budget and within the game's
+AI_CROWDS = (1000, 10000, 50000)
+AI_ROOM_SIZE = 40
+#navigation benchmark: n by n room levels with every door open, 
+# random path queries and a crowd after one goal
+NAV_SIZES = (4, 10)
+NAV_ROOM_SIZE = 10
+NAV_QUERIES = 200
+NAV_AGENTS = 10000
+#ray benchmark: rays cast together, and one at a time like shots
+RAY_SIZES = (10, 32)
+RAY_COUNT = 10000
+RAY_SINGLE = 1000
+#endregion
+################ Level Generation #############################################
+#region
+def generate_level(
+    filename: str, rooms_x: int, rooms_y: int,
+    room_width: int = 6, room_height: int = 6) -> None:
+    """
+        Write a synthetic level: a rooms_x by rooms_y grid of rooms,
+        each one room_width by room_height single-tile sectors, with a
+        door in the middle of every shared room wall.
+    """
+
+    lines = []
+    for i in range(rooms_x*rooms_y):
+        lines.append(f"r{i + 1}()")
+
+    sector_count = 0
+    for ry in range(rooms_y):
+        for rx in range(rooms_x):
+            room = f"r{ry*rooms_x + rx + 1}"
+            door_row = room_height//2
+            door_column = room_width//2
+            for j in range(room_height):
+                for i in range(room_width):
+                    n = int(j == 0 and not (ry > 0 and i == door_column))
+                    s = int(j == room_height - 1 \
+                        and not (ry < rooms_y - 1 and i == door_column))
+                    w = int(i == 0 and not (rx > 0 and j == door_row))
+                    e = int(i == room_width - 1 \
+                        and not (rx < rooms_x - 1 and j == door_row))
+                    #tile coordinates grow downwards, the file's y grows up
+                    x = rx*room_width + i
+                    y = 50 - (ry*room_height + j)
+                    sector_count += 1
+                    lines.append(
+                        f"s{sector_count}({x},{y},1,1,{n},{e},{s},{w},{room})")
+
+    door_count = 0
+    for ry in range(rooms_y):
+        for rx in range(rooms_x):
+            room = f"r{ry*rooms_x + rx + 1}"
+            if rx < rooms_x - 1:
+                #vertical door to the east
+                x = (rx + 1)*room_width
+                y = 50 - (ry*room_height + room_height//2)
+                door_count += 1
+                lines.append(
+                    f"d{door_count}({x},{y},{x},{y - 1},{room},r{ry*rooms_x + rx + 2})")
+            if ry < rooms_y - 1:
+                #horizontal door to the south
+                x = rx*room_width + room_width//2
+                y = 50 - (ry + 1)*room_height
+                door_count += 1
+                lines.append(
+                    f"d{door_count}({x},{y},{x + 1},{y},{room},r{(ry + 1)*rooms_x + rx + 1})")
+
+    #player in the first room, level with its east door
+    lines.append(f"p({room_width/2},{50 - (room_height//2 + 0.5)},0,r1)")
+
+    with open(filename, "w") as f:
+        f.write("\n".join(lines) + "\n")
+#endregion
+################ Camera Paths ##################################################
+#region
+def spin_path(frames: int) -> Iterator[camera_step]:
+    """ turn on the spot """
+
+    for _ in range(frames):
+        yield (1, 0)
+
+def walk_path(frames: int) -> Iterator[camera_step]:
+    """ walk forward, turning a quarter circle every so often """
+
+    for frame in range(frames):
+        if frame % 120 < 90:
+            yield (0, 1)
+        else:
+            yield (3, 0)
+
+def strafe_path(frames: int) -> Iterator[camera_step]:
+    """ sweep back and forth while turning """
+
+    for frame in range(frames):
+        yield (2, 1 if (frame // 60) % 2 == 0 else -1)
+
+CAMERA_PATHS: dict[str, Callable[[int], Iterator[camera_step]]] = {
+    "spin": spin_path,
+    "walk": walk_path,
+    "strafe": strafe_path,
+}
+#endregion
+################ Instrumentation ##############################################
+#region
+class StageTimer:
+    """
+        Wraps functions and methods of the game so every call is timed.
+        Stage times are inclusive: a stage which calls another one
+        also counts the time spent in it.
+    """
+
+    def __init__(self):
+
+        self.totals: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+        self.patches: list[tuple[object, str, object]] = []
+
+    def instrument(self, owner: object, name: str, stage: str) -> None:
+
+        original = getattr(owner, name)
+        self.totals.setdefault(stage, 0.0)
+        self.calls.setdefault(stage, 0)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.totals[stage] += time.perf_counter() - start
+                self.calls[stage] += 1
+
+        self.patches.append((owner, name, original))
+        setattr(owner, name, timed)
+
+    def restore(self) -> None:
+
+        for owner, name, original in reversed(self.patches):
+            setattr(owner, name, original)
+        self.patches = []
+
+    def reset(self) -> None:
+
+        for stage in self.totals:
+            self.totals[stage] = 0.0
+            self.calls[stage] = 0
+
+def instrument_pipeline(timer: StageTimer) -> None:
+
+    timer.instrument(prototype, "project_walls", "project_walls")
+    timer.instrument(Camera, "to_view", "Camera.to_view")
+    timer.instrument(prototype, "view_to_screen_transform", "view_to_screen_transform")
+    timer.instrument(prototype, "project_instances", "project_instances")
+    timer.instrument(GameView, "draw_entities", "GameView.draw_entities")
+    timer.instrument(MapView, "draw_entity", "MapView.draw_entity")
+    timer.instrument(HeadlessCanvas, "create_line", "canvas.create_line")
+    timer.instrument(HeadlessCanvas, "create_oval", "canvas.create_oval")
+    timer.instrument(HeadlessCanvas, "coords", "canvas.coords")
+    timer.instrument(HeadlessCanvas, "itemconfig", "canvas.itemconfig")
+    timer.instrument(prototype, "rasterize_lines", "rasterize_lines")
+    timer.instrument(prototype.HeadlessImage, "configure", "image.configure")
+#endregion
+################ Frame Benchmark ##############################################
+#region
+def run_frames(
+    scene: Scene, views: list, path: Iterator[camera_step],
+    pool_totals: dict[str, int] = None, 
+    cull_totals: dict[str, int] = None,
+    profiler: prototype.FrameProfiler = None,
+    threaded: bool = False) -> int:
+    """
+        Threaded, each frame is built on a worker while the one 
+        before is submitted, as the game does.
+    """
+
+    if profiler is None:
+        profiler = prototype.FrameProfiler()
+    pipeline = prototype.FramePipeline(views, threaded)
+    frames = 0
+    camera = None
+    path = iter(path)
+    while True:
+        profiler.begin_frame()
+        with profiler.stage("wait for build"):
+            pipeline.finish()
+        step = next(path, None)
+        if step is not None:
+            spin, move = step
+            with profiler.stage("scene"):
+                scene.spin_player(spin)
+                if move != 0:
+                    scene.move_player(move)
+                scene.update()
+            camera = Camera.from_player(scene.player, camera)
+            pipeline.start(scene, camera)
+
+        commands = pipeline.take()
+        if commands is None:
+            if step is None:
+                break
+            continue
+        profiler.count("build", pipeline.build_time)
+        for view, view_commands in zip(views, commands):
+            with profiler.stage(type(view).__name__ + ".submit"):
+                view.submit(view_commands)
+            if pool_totals is not None:
+                for key, value in view.pool.stats.items():
+                    pool_totals[key] = pool_totals.get(key, 0) + value
+            if cull_totals is not None and isinstance(view, GameView):
+                for key, value in view_commands.stats.items():
+                    cull_totals[key] = cull_totals.get(key, 0) + value
+        profiler.count("canvas items", sum(sum(view.pool.used.values()) for view in views))
+        profiler.count("tcl calls", sum(view.pool.stats["tcl calls"] for view in views))
+        profiler.end_frame()
+        frames += 1
+    return frames
+
+def benchmark_frames(
+    level: str, path_name: str, frames: int,
+    record: bool = False, seed: int = 0, 
+    backend: str = prototype.RENDER_BACKEND, 
+    export: str = None, threaded: bool = False) -> dict[str, float]:
+    """
+        Fly the camera along a scripted path and report ms/frame,
+        total and per stage, and frame time percentiles. 
+        With export, the per-frame profile is written to 
+        <export>.csv and <export>.json. Threaded, display lists 
+        are built on a worker and stages on both threads are 
+        timed, so they can add up to more than the frame.
+    """
+
+    random.seed(seed)
+    scene = Scene(level)
+    views = [
+        MapView(HeadlessCanvas(record = record), backend = backend),
+        GameView(HeadlessCanvas(record = record), backend = backend)
+    ]
+
+    timer = StageTimer()
+    instrument_pipeline(timer)
+    pool_totals = {}
+    cull_totals = {}
+    profiler = prototype.FrameProfiler(window = frames)
+    try:
+        start = time.perf_counter()
+        frame_count = run_frames(
+            scene, views, CAMERA_PATHS[path_name](frames), 
+            pool_totals, cull_totals, profiler, threaded)
+        elapsed = time.perf_counter() - start
+    finally:
+        timer.restore()
+    if export is not None:
+        profiler.export_csv(export + ".csv")
+        profiler.export_json(export + ".json")
+
+    tk_calls = sum(view.canvas.call_count for view in views) + sum(
+        view.pool.image.call_count for view in views if hasattr(view.pool, "image"))
+    results = {"frame": 1000*elapsed/frame_count, "tk calls": tk_calls/frame_count}
+    for name, value in profiler.percentiles("frame").items():
+        results["percentile " + name] = value
+    results["build p50"] = profiler.percentiles("build")["p50"]
+    for key, value in pool_totals.items():
+        results["items " + key] = value/frame_count
+    for key, value in cull_totals.items():
+        results["culled " + key] = value/frame_count
+    for stage, total in timer.totals.items():
+        results[stage] = 1000*total/frame_count
+        results[stage + " calls"] = timer.calls[stage]/frame_count
+    return results
+
+def check_batched_walls(
+    level: str, path_name: str, frames: int, seed: int = 0) -> int:
+    """
+        Render every frame with the scalar and the batched wall path
+        and return how many frames drew a different set of lines.
+        The scalar path can't occlude, so neither does the batched one.
+    """
+
+    random.seed(seed)
+    scene = Scene(level)
+    scalar = GameView(HeadlessCanvas(), batched = False, portals = False, occlusion = False)
+    batched = GameView(HeadlessCanvas(), batched = True, portals = False, occlusion = False)
+
+    def drawn(view: GameView) -> set:
+        return {
+            (coords, options["fill"]) 
+            for _, coords, options in view.canvas.items.values() 
+            if options.get("state") != "hidden"
+        }
+
+    mismatches = 0
+    for spin, move in CAMERA_PATHS[path_name](frames):
+        scene.spin_player(spin)
+        if move != 0:
+            scene.move_player(move)
+        scene.update()
+        camera = Camera.from_player(scene.player)
+        scalar.redraw(scene, camera)
+        batched.redraw(scene, camera)
+        if drawn(scalar) != drawn(batched):
+            mismatches += 1
+    return mismatches
+
+def print_frame_results(title: str, results: dict[str, float]) -> None:
+
+    print(f"\n{title}")
+    print(f"    {'stage':36} {'ms/frame':>10} {'calls/frame':>12}")
+    print(f"    {'frame':36} {results['frame']:10.3f}")
+    percentiles = [
+        f"{key[11:]} {value:.3f}" for key, value in results.items() 
+        if key.startswith("percentile ")]
+    print("    frame ms " + ", ".join(percentiles))
+    print(f"    display list build p50 {results['build p50']:.3f} ms")
+    for stage, value in results.items():
+        if stage in ("frame", "build p50") or stage.endswith(" calls") or stage.startswith(
+            ("items ", "culled ", "percentile ")):
+            continue
+        calls = results[stage + " calls"]
+        print(f"    {stage:36} {value:10.3f} {calls:12.1f}")
+    items = [f"{key[6:]} {value:.1f}" for key, value in results.items() if key.startswith("items ")]
+    print("    canvas items/frame: " + ", ".join(items))
+    culled = [f"{key[7:]} {value:.1f}" for key, value in results.items() if key.startswith("culled ")]
+    print("    walls drawn and culled/frame: " + ", ".join(culled))
+    print(f"    tk calls/frame: {results['tk calls']:.1f}")
+#endregion
+################ Load Benchmark ###############################################
+#region
+def benchmark_loading(
+    directory: str, sizes: tuple[int] = LOAD_SIZES, 
+    room_size: int = LOAD_ROOM_SIZE) -> list[tuple[int, float]]:
+    """
+        Time level loading on synthetic levels of growing size: the
+        text parser alone, the compiled cache alone, and building the
+        whole Scene from each. Returns (sector count, seconds for 
+        each of those) per level. Linear loading shows as a flat time
+        per sector. The cyclic garbage collector is paused while 
+        timing, its passes grow with the whole heap and would hide 
+        the loader's own scaling.
+    """
+
+    def timed(load: Callable[[], object]) -> tuple[object, float]:
+        random.seed(0)
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            result = load()
+            return result, time.perf_counter() - start
+        finally:
+            gc.enable()
+
+    results = []
+    for size in sizes:
+        filename = os.path.join(directory, f"load_{size}x{size}.txt")
+        generate_level(filename, size, size, room_size, room_size)
+
+        level, parse = timed(lambda: LevelData.parse(filename))
+        prototype.load_level(filename)
+        _, mapped = timed(lambda: prototype.load_level(filename))
+        _, text_scene = timed(lambda: Scene(filename, use_cache = False))
+        _, cached_scene = timed(lambda: Scene(filename))
+
+        results.append((level.sector_count(), parse, mapped, text_scene, cached_scene))
+        del level
+    return results
+
+def print_load_results(results: list[tuple[int, float]]) -> None:
+
+    print("\nlevel loading, ms (us/sector)")
+    print(f"    {'sectors':>10} {'parse':>18} {'cache':>18} {'scene, text':>18} {'scene, cache':>18}")
+    for sectors, *timings in results:
+        cells = [f"{1000*t:8.1f} ({1e6*t/sectors:6.2f})" for t in timings]
+        print(f"    {sectors:10} " + " ".join(f"{cell:>18}" for cell in cells))
+#endregion
+################ Streaming Benchmark ##########################################
+#region
+def benchmark_streaming(
+    directory: str, size: int = STREAM_SIZE, 
+    budgets: tuple[int | None] = STREAM_BUDGETS,
+    room_size: int = LOAD_ROOM_SIZE) -> list[dict[str, float]]:
+    """
+        Walk east through a row of rooms on a size by size level and 
+        track how many sectors are loaded, with and without a budget.
+    """
+
+    filename = os.path.join(directory, f"stream_{size}x{size}.txt")
+    generate_level(filename, size, size, room_size, room_size)
+    frames = size*room_size*32 // STREAM_STEP
+
+    results = []
+    for budget in budgets:
+        random.seed(0)
+        scene = Scene(filename, sector_budget = budget or scene_sector_count(filename))
+        peak = 0
+        visited = set()
+        start = time.perf_counter()
+        for _ in range(frames):
+            scene.move_player(STREAM_STEP)
+            scene.update()
+            peak = max(peak, len(scene.sectors))
+            visited.add(scene.player.sector.room)
+        elapsed = time.perf_counter() - start
+
+        results.append({
+            "budget": budget or 0,
+            "level sectors": scene.level.sector_count(),
+            "rooms visited": len(visited),
+            "peak sectors": peak,
+            "final sectors": len(scene.sectors),
+            #generation goes up once per load and once per unload
+            "rooms unloaded": sum(room.generation // 2 for room in scene.rooms),
+            "ms/frame": 1000*elapsed/frames,
+        })
+    return results
+
+def scene_sector_count(filename: str) -> int:
+
+    return prototype.load_level(filename).sector_count()
+
+def print_streaming_results(results: list[dict[str, float]]) -> None:
+
+    print("\nroom streaming")
+    for result in results:
+        budget = result["budget"] or "none"
+        print(f"    budget {budget}: " + ", ".join(
+            f"{key} {value:.3g}" if isinstance(value, float) else f"{key} {value}"
+            for key, value in result.items() if key != "budget"))
+
+def benchmark_room_tracking(
+    directory: str, size: int = STREAM_SIZE, room_size: int = LOAD_ROOM_SIZE, 
+    jitter: int = ROOM_JITTER_FRAMES) -> dict[str, float]:
+    """
+        Walk east through a row of rooms on a size by size level, 
+        timing the active room and door tracking each frame, then 
+        step back and forth at the first door to open and count 
+        the rooms turning on and off.
+    """
+
+    filename = os.path.join(directory, f"rooms_{size}x{size}.txt")
+    generate_level(filename, size, size, room_size, room_size)
+    frames = size*room_size*32 // STREAM_STEP
+
+    random.seed(0)
+    scene = Scene(filename)
+    times = []
+    checked = 0
+    changes = 0
+    for _ in range(frames):
+        scene.move_player(STREAM_STEP)
+        scene.frame += 1
+        start = time.perf_counter()
+        scene.update_rooms()
+        times.append(time.perf_counter() - start)
+        checked += scene.room_stats["doors checked"]
+        changes += scene.room_stats["rooms changed"]
+
+    #back to the first door, then dither at the distance it opened at
+    scene = Scene(filename)
+    while not scene.open_doors:
+        scene.move_player(1)
+        scene.update_rooms()
+    flips = 0
+    for i in range(jitter):
+        scene.move_player(-1 if i % 2 == 0 else 1)
+        scene.update_rooms()
+        flips += scene.room_stats["rooms changed"]
+
+    times = np.array(times)*1000
+    return {
+        "rooms": len(scene.rooms),
+        "doors": len(scene.doors),
+        "frames": frames,
+        "p50 ms/frame": float(np.percentile(times, 50)),
+        "max ms/frame": float(times.max()),
+        "doors checked/frame": checked/frames,
+        "room changes": changes,
+        f"room changes in {jitter} frames at a door": flips,
+    }
+
+def print_room_tracking_results(results: dict[str, float]) -> None:
+
+    print("\nactive room tracking")
+    print("    " + ", ".join(
+        f"{key} {value:.3g}" if isinstance(value, float) else f"{key} {value}"
+        for key, value in results.items()))
+#endregion
+################ Entity Benchmark #############################################
+#region
+def benchmark_entities(
+    counts: tuple[int] = ENTITY_COUNTS, 
+    sectors: int = ENTITY_SECTORS,
+    query_sectors: int = ENTITY_QUERY_SECTORS) -> list[dict[str, float]]:
+    """
+        Fill a pool with drakes spread over a level's worth of sectors,
+        then time the per-frame work done over it: finding the drakes 
+        in the visible sectors and moving every drake into view space.
+    """
+
+    results = []
+    for count in counts:
+        random.seed(0)
+        pool = prototype.EntityPool()
+        start = time.perf_counter()
+        for _ in range(count):
+            sector = random.randrange(sectors)
+            pool.allocate(
+                random.uniform(0, 3200), random.uniform(0, 3200), 0, 40, 12, sector)
+        allocate = time.perf_counter() - start
+
+        rows = random.sample(range(sectors), query_sectors)
+        start = time.perf_counter()
+        for _ in range(100):
+            slots = pool.in_sectors(rows)
+        query = (time.perf_counter() - start) / 100
+
+        camera = Camera((1600.0, 1600.0), 30.0, 30.0)
+        start = time.perf_counter()
+        for _ in range(100):
+            live = pool.live_slots()
+            x = pool.x[live] + camera.translation[0]
+            y = pool.y[live] + camera.translation[1]
+            view_x = x*camera.cos + y*camera.sin
+            view_y = -x*camera.sin + y*camera.cos
+        transform = (time.perf_counter() - start) / 100
+
+        results.append({
+            "drakes": count,
+            "bytes/drake": sum(
+                getattr(pool, name).nbytes 
+                for name in ("x", "y", "z", "height", "size", "sector", "alive")
+            ) / pool.capacity(),
+            "allocate us/drake": 1e6*allocate/count,
+            "query ms": 1000*query,
+            "queried drakes": slots.shape[0],
+            "view transform ms": 1000*transform,
+        })
+    return results
+
+def print_entity_results(results: list[dict[str, float]]) -> None:
+
+    print("\nentity pool")
+    for result in results:
+        print(f"    {result['drakes']} drakes: " + ", ".join(
+            f"{key} {value:.3g}" if isinstance(value, float) else f"{key} {value}"
+            for key, value in result.items() if key != "drakes"))
+#endregion
+################ Crowd Benchmark ##############################################
+#region
+def benchmark_crowds(
+    directory: str, frames: int, 
+    crowds: tuple[int] = CROWD_SIZES, 
+    room_size: int = CROWD_ROOM_SIZE) -> list[dict[str, float]]:
+    """
+        Spin in the middle of one big room with more and more drakes 
+        in it, with and without levels of detail, and report the game 
+        view's cost and canvas lines per frame.
+    """
+
+    level = os.path.join(directory, f"crowd_{room_size}.txt")
+    generate_level(level, 1, 1, room_size, room_size)
+
+    full_detail = prototype.ModelMesh(
+        prototype.DRAKE_MODEL, prototype.DRAKE_COLORS, 
+        loops = (prototype.DRAKE_BODY, prototype.DRAKE_FACE),
+        lods = prototype.DRAKE_LODS[:1])
+    lod_mesh = prototype.DRAKE_MESH
+
+    results = []
+    for crowd in crowds:
+        for name, mesh in (("full", full_detail), ("lod", lod_mesh)):
+            random.seed(0)
+            scene = Scene(level)
+            for _ in range(crowd):
+                sector = random.choice(scene.player.room.sectors)
+                scene.drakes.allocate(
+                    sector.pos_a[0] + random.uniform(0, sector.size[0]),
+                    sector.pos_a[1] + random.uniform(0, sector.size[1]),
+                    0, 40, 12, sector.index)
+            view = GameView(HeadlessCanvas())
+            lines = 0
+
+            prototype.DRAKE_MESH = mesh
+            try:
+                start = time.perf_counter()
+                camera = None
+                for spin, _ in spin_path(frames):
+                    scene.spin_player(spin)
+                    scene.update()
+                    camera = Camera.from_player(scene.player, camera)
+                    view.redraw(scene, camera)
+                    lines += view.pool.used["line"]
+                elapsed = time.perf_counter() - start
+            finally:
+                prototype.DRAKE_MESH = lod_mesh
+
+            results.append({
+                "crowd": crowd,
+                "mesh": name,
+                "ms/frame": 1000*elapsed/frames,
+                "lines/frame": lines/frames,
+            })
+    return results
+
+def print_crowd_results(results: list[dict[str, float]]) -> None:
+
+    print("\nlevel of detail")
+    for result in results:
+        print(f"    {result['crowd']} extra drakes, {result['mesh']} detail: "
+            f"{result['ms/frame']:.3g} ms/frame, {result['lines/frame']:.4g} lines/frame")
+#endregion
+################ Movement Benchmark ###########################################
+#region
+def benchmark_agents(
+    directory: str, ticks: int = AGENT_TICKS,
+    counts: tuple[int] = AGENT_COUNTS, speeds: tuple[float] = AGENT_SPEEDS,
+    rooms: int = AGENT_ROOMS) -> list[dict[str, float]]:
+    """
+        Walk crowds of agents in straight lines about a grid of rooms, 
+        turning whenever a wall stops them, and time move_agents. 
+        The doors stay shut, so an agent found outside its room or 
+        its sector has gone through a wall.
+    """
+
+    level_file = os.path.join(directory, f"agents_{rooms}x{rooms}.txt")
+    generate_level(level_file, rooms, rooms)
+    level = LevelData.parse(level_file)
+    sectors = prototype.SectorMap(level)
+
+    results = []
+    for count in counts:
+        for speed in speeds:
+            rng = np.random.default_rng(0)
+            sector = rng.integers(0, level.sector_count(), count).astype(np.int32)
+            low = sectors.low[sector]
+            high = sectors.high[sector]
+            x = (low[:,0] + high[:,0]) / 2
+            y = (low[:,1] + high[:,1]) / 2
+            radius = np.full(count, 6.0)
+            heading = rng.uniform(0, 2*np.pi, count)
+            rooms_at_start = level.sector_rooms[sector]
+
+            start = time.perf_counter()
+            for _ in range(ticks):
+                dx = speed*np.cos(heading)
+                dy = speed*np.sin(heading)
+                new_x, new_y, sector = prototype.move_agents(
+                    sectors, x, y, sector, dx, dy, radius)
+                stopped = np.abs(new_x - x) + np.abs(new_y - y) < 0.5*speed
+                heading[stopped] = rng.uniform(0, 2*np.pi, int(stopped.sum()))
+                x, y = new_x, new_y
+            elapsed = time.perf_counter() - start
+
+            results.append({
+                "agents": count,
+                "speed": speed,
+                "ms/tick": 1000*elapsed/ticks,
+                "agents/ms": count*ticks/(1000*elapsed),
+                "outside sector": int((~sectors.contains(sector, x, y)).sum()),
+                "left room": int((level.sector_rooms[sector] != rooms_at_start).sum()),
+            })
+    return results
+
+def print_agent_results(results: list[dict[str, float]]) -> None:
+
+    print("\nagent movement")
+    for result in results:
+        print(f"    {result['agents']} agents at {result['speed']}/tick: " + ", ".join(
+            f"{key} {value:.3g}" if isinstance(value, float) else f"{key} {value}"
+            for key, value in result.items() if key not in ("agents", "speed")))
+
+def benchmark_ai(
+    directory: str, ticks: int = AGENT_TICKS, 
+    crowds: tuple[int] = AI_CROWDS, room_size: int = AI_ROOM_SIZE) -> list[dict[str, float]]:
+    """
+        Let crowds of drakes wander and chase the player round one 
+        big room and time Scene.update_drakes, with no time budget 
+        and with the default one.
+    """
+
+    level = os.path.join(directory, f"ai_{room_size}.txt")
+    generate_level(level, 1, 1, room_size, room_size)
+
+    results = []
+    for crowd in crowds:
+        for budget in (float("inf"), prototype.AI_BUDGET):
+            random.seed(0)
+            scene = Scene(level, ai_budget = budget)
+            sectors = scene.player.room.sectors
+            for _ in range(crowd):
+                sector = random.choice(sectors)
+                scene.drakes.allocate(
+                    sector.pos_a[0] + random.uniform(0, sector.size[0]),
+                    sector.pos_a[1] + random.uniform(0, sector.size[1]),
+                    0, 40, 12, sector.index)
+            scene.update()
+
+            thought = 0
+            waiting = 0
+            elapsed = 0.0
+            for _ in range(ticks):
+                scene.spin_player(1)
+                start = time.perf_counter()
+                scene.update_drakes()
+                elapsed += time.perf_counter() - start
+                thought += scene.ai_stats["thought"]
+                waiting += scene.ai_stats["waiting"]
+
+            drakes = scene.drakes
+            results.append({
+                "drakes": drakes.live_slots().shape[0],
+                "budget": budget,
+                "ms/tick": 1000*elapsed/ticks,
+                "agents/ms": thought/(1000*elapsed),
+                "thought/tick": thought/ticks,
+                "waiting/tick": waiting/ticks,
+                "chasing": int((drakes.state[drakes.live_slots()] == prototype.DRAKE_CHASE).sum()),
+            })
+    return results
+
+def print_ai_results(results: list[dict[str, float]]) -> None:
+
+    print("\ndrake AI")
+    for result in results:
+        print(f"    {result['drakes']} drakes, budget {result['budget']} ms: " + ", ".join(
+            f"{key} {value:.3g}" if isinstance(value, float) else f"{key} {value}"
+            for key, value in result.items() if key not in ("drakes", "budget")))
+#endregion
+################ Navigation Benchmark #########################################
+#region
+def benchmark_navigation(
+    directory: str, sizes: tuple[int] = NAV_SIZES, room_size: int = NAV_ROOM_SIZE,
+    queries: int = NAV_QUERIES, agents: int = NAV_AGENTS) -> list[dict[str, float]]:
+    """
+        Time path queries between random sectors of n by n room 
+        levels with every door open: cold, then the same ones again 
+        from the cache. Then many agents finding their way to one 
+        sector, by a path each against one shared flow field.
+    """
+
+    results = []
+    for size in sizes:
+        level_file = os.path.join(directory, f"navigation_{size}x{size}.txt")
+        generate_level(level_file, size, size, room_size, room_size)
+        level = LevelData.parse(level_file)
+        sectors = prototype.SectorMap(level)
+        start = time.perf_counter()
+        navigation = prototype.NavGraph(sectors, level)
+        build = time.perf_counter() - start
+        for door in range(level.door_count()):
+            sectors.set_door(door, False)
+
+        rng = np.random.default_rng(0)
+        pairs = rng.integers(0, level.sector_count(), (queries, 2)).tolist()
+        start = time.perf_counter()
+        found = sum(navigation.path(a, b) is not None for a, b in pairs)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        for a, b in pairs:
+            navigation.path(a, b)
+        warm = time.perf_counter() - start
+
+        #everyone after the same goal, as drakes chasing the player are
+        goal = int(rng.integers(0, level.sector_count()))
+        rows = rng.integers(0, level.sector_count(), agents)
+        start = time.perf_counter()
+        for row in rows[:queries].tolist():
+            navigation.path(row, goal)
+        each = (time.perf_counter() - start) / queries
+        start = time.perf_counter()
+        (via, _) = navigation.flow_to(goal)
+        steps = navigation.edge_to[via[rows]]
+        shared = time.perf_counter() - start
+
+        results.append({
+            "sectors": level.sector_count(),
+            "build ms": 1000*build,
+            "found": f"{found}/{queries}",
+            "cold ms/path": 1000*cold/queries,
+            "cached ms/path": 1000*warm/queries,
+            f"{agents} agents, paths ms": 1000*each*agents,
+            f"{agents} agents, flow ms": 1000*shared,
+        })
+    return results
+
+def print_navigation_results(results: list[dict[str, float]]) -> None:
+
+    print("\nnavigation")
+    for result in results:
+        print(f"    {result['sectors']} sectors: " + ", ".join(
+            f"{key} {value:.3g}" if isinstance(value, float) else f"{key} {value}"
+            for key, value in result.items() if key != "sectors"))
+
+def benchmark_rays(
+    directory: str, sizes: tuple[int] = RAY_SIZES, room_size: int = NAV_ROOM_SIZE,
+    rays: int = RAY_COUNT, single: int = RAY_SINGLE) -> list[dict[str, float]]:
+    """
+        Cast rays from random points in random directions through 
+        n by n room levels with every door open, all together as 
+        line of sight checks would and one at a time as shots are.
+    """
+
+    results = []
+    for size in sizes:
+        level_file = os.path.join(directory, f"rays_{size}x{size}.txt")
+        generate_level(level_file, size, size, room_size, room_size)
+        level = LevelData.parse(level_file)
+        sectors = prototype.SectorMap(level)
+        for door in range(level.door_count()):
+            sectors.set_door(door, False)
+
+        rng = np.random.default_rng(0)
+        row = rng.integers(0, level.sector_count(), rays).astype(np.int32)
+        (low, high) = (sectors.low[row], sectors.high[row])
+        x = low[:,0] + rng.uniform(0, 1, rays)*(high[:,0] - low[:,0])
+        y = low[:,1] + rng.uniform(0, 1, rays)*(high[:,1] - low[:,1])
+        angle = rng.uniform(0, 2*np.pi, rays)
+        (dx, dy) = (np.cos(angle), np.sin(angle))
+        reach = np.full(rays, float(prototype.RAY_REACH))
+
+        start = time.perf_counter()
+        (distance, _, (passed, _)) = prototype.cast_rays(sectors, x, y, row, dx, dy, reach)
+        together = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(single):
+            prototype.cast_rays(
+                sectors, x[i:i + 1], y[i:i + 1], row[i:i + 1], 
+                dx[i:i + 1], dy[i:i + 1], reach[i:i + 1])
+        one_by_one = time.perf_counter() - start
+
+        results.append({
+            "sectors": level.sector_count(),
+            "rays/s together": rays/together,
+            "rays/s one at a time": single/one_by_one,
+            "sectors/ray": passed.shape[0]/rays,
+            "mean distance": float(distance.mean()),
+        })
+    return results
+
+def print_ray_results(results: list[dict[str, float]]) -> None:
+
+    print("\nray casting")
+    for result in results:
+        print(f"    {result['sectors']} sectors: " + ", ".join(
+            f"{key} {value:.3g}" for key, value in result.items() if key != "sectors"))
+#endregion
+###############################################################################
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description = __doc__.strip())
+    parser.add_argument("--frames", type = int, default = DEFAULT_FRAMES)
+    parser.add_argument("--paths", nargs = "+", default = list(CAMERA_PATHS))
+    parser.add_argument("--level", default = "level.txt")
+    parser.add_argument("--sizes", type = int, nargs = "*", default = [4, 8],
+        help = "also run synthetic n by n room levels")
+    parser.add_argument("--backend", choices = ("canvas", "framebuffer"), 
+        default = prototype.RENDER_BACKEND, help = "how the views draw")
+    parser.add_argument("--threaded", action = "store_true",
+        help = "build each frame's display lists on a worker thread")
+    parser.add_argument("--export", metavar = "PREFIX",
+        help = "write each run's per-frame profile to PREFIX_<run>.csv and .json")
+    parser.add_argument("--record", action = "store_true",
+        help = "keep every canvas item instead of a null sink")
+    parser.add_argument("--check", action = "store_true",
+        help = "compare batched and scalar wall projection")
+    parser.add_argument("--load", type = int, nargs = "*",
+        help = "time level loading on n by n room levels instead")
+    parser.add_argument("--stream", action = "store_true",
+        help = "walk through a large level and report loaded sectors instead")
+    parser.add_argument("--rooms", action = "store_true",
+        help = "time active room tracking on a large level instead")
+    parser.add_argument("--entities", action = "store_true",
+        help = "time entity pool queries on up to 100k drakes instead")
+    parser.add_argument("--crowd", action = "store_true",
+        help = "compare levels of detail in a crowded room instead")
+    parser.add_argument("--agents", action = "store_true",
+        help = "time moving up to 100k agents with collision instead")
+    parser.add_argument("--ai", action = "store_true",
+        help = "time drake AI on up to 50k drakes instead")
+    parser.add_argument("--navigation", action = "store_true",
+        help = "time path queries and flow fields on large levels instead")
+    parser.add_argument("--rays", action = "store_true",
+        help = "time ray casts through large levels instead")
+    args = parser.parse_args()
+
+    if args.entities:
+        print_entity_results(benchmark_entities())
+        return
+    if args.crowd:
+        with tempfile.TemporaryDirectory() as directory:
+            print_crowd_results(benchmark_crowds(directory, args.frames))
+        return
+    if args.agents:
+        with tempfile.TemporaryDirectory() as directory:
+            print_agent_results(benchmark_agents(directory))
+        return
+    if args.ai:
+        with tempfile.TemporaryDirectory() as directory:
+            print_ai_results(benchmark_ai(directory))
+        return
+    if args.navigation:
+        with tempfile.TemporaryDirectory() as directory:
+            print_navigation_results(benchmark_navigation(directory))
+        return
+    if args.rays:
+        with tempfile.TemporaryDirectory() as directory:
+            print_ray_results(benchmark_rays(directory))
+        return
+
+    levels = [(args.level, args.level)]
+    with tempfile.TemporaryDirectory() as directory:
+        if args.load is not None:
+            print_load_results(benchmark_loading(directory, args.load or LOAD_SIZES))
+            return
+        if args.stream:
+            print_streaming_results(benchmark_streaming(directory))
+            return
+        if args.rooms:
+            print_room_tracking_results(benchmark_room_tracking(directory))
+            return
+
+        for size in args.sizes:
+            filename = os.path.join(directory, f"grid_{size}x{size}.txt")
+            generate_level(filename, size, size)
+            levels.append((f"{size}x{size} rooms", filename))
+
+        for name, filename in levels:
+            for path_name in args.paths:
+                if args.check:
+                    mismatches = check_batched_walls(filename, path_name, args.frames)
+                    print(f"{name}, {path_name} path: "
+                        f"{mismatches} of {args.frames} frames differ")
+                    continue
+                export = None
+                if args.export is not None:
+                    run = os.path.splitext(os.path.basename(filename))[0]
+                    export = f"{args.export}_{run}_{path_name}"
+                results = benchmark_frames(
+                    filename, path_name, args.frames, args.record, 
+                    backend = args.backend, export = export, threaded = args.threaded)
+                print_frame_results(f"{name}, {path_name} path", results)
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,20 @@
 ################ 3D Game ######################################################
 #region
 import tkinter as tk
+import contextlib
+import hashlib
+import heapq
 import math
+import mmap
+import os
 import random
+import csv
+import json
+import struct
+import time
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
 #endregion
 ################ Type Aliases   ###############################################
 #region
@@ -21,11 +33,94 @@ SCREEN_WIDTH = 450
 SCREEN_HEIGHT = 300
 CENTER = (SCREEN_WIDTH//2,SCREEN_HEIGHT//2)
 NEAR_PLANE = ((-1, -0.01), (1, -0.01))
+#portals the camera is within this of are looked through whole, 
+# nearer than the near plane their projection falls apart
+PORTAL_EPSILON = 0.01
+#outcodes for the sides of the 90 degree view frustum, 
+# widened by a pixel so nothing on the screen edge is dropped
+FRUSTUM_LEFT = 1
+FRUSTUM_RIGHT = 2
+FRUSTUM_SLOPE = 1 + 2/SCREEN_WIDTH
 SPAWN_RATE = 1.0
+#milliseconds between updates while playing, 
+# and the longest wait once nothing is happening
+FRAME_INTERVAL = 16
+IDLE_INTERVAL = 250
+#simulation ticks per second, whatever the frame rate, and the most 
+# ticks a frame may run beyond those it was scheduled for, to catch up
+# after overrunning, before the game slows down instead. At least an 
+# idle interval's worth, so waking from idle never loses time
+TICK_RATE = 60
+MAX_CATCH_UP_TICKS = IDLE_INTERVAL*TICK_RATE // 1000
+
+#frames the profiler keeps for its percentiles, 
+# and where it exports them (F2 in debug mode)
+PROFILE_WINDOW = 600
+PROFILE_PERCENTILES = (50, 95, 99)
+PROFILE_EXPORT = "frame_profile"
+#side of a spatial index cell, in world units
+GRID_CELL_SIZE = 64
+#longest distance an agent moves between collision checks, 
+# under the smallest sector so none can be stepped over
+MOVE_STEP = 16
+#how far shots reach, in world units, and how far past an edge a 
+# ray looks for the sector on the other side
+RAY_REACH = 2048
+RAY_NUDGE = 1e-3
+#path queries each NavGraph cache keeps, and flow fields 
+# (one per goal sector)
+NAV_PATH_CACHE = 256
+NAV_FLOW_CACHE = 8
+#Manhattan distances at which doors open, and close again: 
+# apart, so standing at the edge doesn't flip rooms on and off
+DOOR_OPEN_DISTANCE = 32
+DOOR_CLOSE_DISTANCE = 48
+
+#loaded sectors allowed before idle rooms are unloaded, 
+# and how many frames a room must be idle for
+SECTOR_BUDGET = 20000
+ROOM_IDLE_FRAMES = 300
+
+#starting slots in an entity pool, doubled as needed
+ENTITY_POOL_CAPACITY = 1024
+
+#drake states
+DRAKE_WANDER = 0
+DRAKE_CHASE = 1
+#drake speeds in world units a tick, how much a wandering drake turns
+# a tick (degrees), how near the player must come to be noticed, how 
+# far away they're forgotten again and how close a chasing drake gets
+DRAKE_WANDER_SPEED = 0.5
+DRAKE_CHASE_SPEED = 1.5
+DRAKE_WANDER_TURN = 10
+DRAKE_NOTICE_DISTANCE = 192
+DRAKE_FORGET_DISTANCE = 288
+DRAKE_CHASE_STOP = 32
+#milliseconds a tick may spend thinking for drakes. Drakes near the 
+# player and on screen go first, then the rest, each taking turns 
+# AI_BATCH at a time until it runs out, though AI_MIN_BATCH of each 
+# always think. Who is near is worked out again when the active rooms
+# or the drakes change, or every AI_REFRESH_TICKS. A drake that waited
+# catches up in one step of at most AI_MAX_TICKS
+AI_BUDGET = 2.0
+AI_NEAR_DISTANCE = 256
+AI_BATCH = 512
+AI_MIN_BATCH = 32
+AI_REFRESH_TICKS = 15
+AI_MAX_TICKS = 30
+
+#compiled levels are stored next to the text as <level>.levelcache
+LEVEL_CACHE_SUFFIX = ".levelcache"
+LEVEL_CACHE_MAGIC = b"LVLC"
+LEVEL_CACHE_VERSION = 1
+#magic, version, source sha1, source size, source mtime, 
+# room, sector and door counts, length of the tag block
+LEVEL_CACHE_HEADER = "<4sI20sqqIIIQ"
 
 DRAKE_BODY = 0
 DRAKE_FACE = 1
 DRAKE_MISC = 2
+DRAKE_SILHOUETTE = 3
 
 DRAKE_MODEL = {
     DRAKE_BODY: (
@@ -50,14 +145,70 @@ DRAKE_MODEL = {
         ((-1.15, 0.0, 7.2), (-0.85, 0.0, 7.2)), #mouth
         (( -0.5, 0.0, 4.2), ( -0.5, 0.0, 0.0)), #left leg
         ((  0.5, 0.0, 3.4), (  0.5, 0.0, 0.0)), #right leg
-    )
+    ),
+
+    DRAKE_SILHOUETTE: (
+        ((  0.0, 0.0, 0.0), (  0.0, 0.0, 10.0)),
+    ),
+}
+
+#parts drawn at each level of detail, finest first, and the 
+# projected height in pixels a drake needs for each level.
+# Drakes smaller than the last are not drawn.
+DRAKE_LODS = (
+    (DRAKE_BODY, DRAKE_FACE, DRAKE_MISC),
+    (DRAKE_BODY,),
+    (DRAKE_SILHOUETTE,),
+)
+DRAKE_LOD_PIXELS = (40, 12, 2)
+#canvas lines all drakes together may use in a frame, 
+# the farthest drakes lose detail first when it's exceeded
+DRAKE_LINE_BUDGET = 400
+
+#sector edge name -> index of the wall flag in Sector.sides
+EDGE_SIDES = {
+    "ab": 3, #west
+    "bc": 2, #south
+    "cd": 1, #east
+    "da": 0, #north
 }
+EDGES = tuple(EDGE_SIDES)
 
 DRAKE_COLORS = {
     DRAKE_BODY: "yellow",
     DRAKE_FACE: "brown",
     DRAKE_MISC: "white",
+    DRAKE_SILHOUETTE: "yellow",
+}
+
+#how views draw: "canvas" keeps a Tk item per line, 
+# "framebuffer" rasterizes each frame and uploads it as one image
+RENDER_BACKEND = "canvas"
+#Tk colour names used by the views, as the framebuffer draws them
+COLOR_RGB = {
+    "black":  (  0,   0,   0),
+    "white":  (255, 255, 255),
+    "red":    (255,   0,   0),
+    "green":  (  0, 255,   0),
+    "cyan":   (  0, 255, 255),
+    "yellow": (255, 255,   0),
+    "brown":  (165,  42,  42),
 }
+#display lists store colours as an index into COLOR_RGB
+COLOR_INDEX = {color: i for i, color in enumerate(COLOR_RGB)}
+COLOR_NAMES = tuple(COLOR_RGB)
+#build the next frame's display lists on a worker thread 
+# while the main thread hands the last one to Tk
+PIPELINED_BUILD = True
+#display list keys name each piece of geometry the same way
+# every frame: its kind times DISPLAY_KEY_SPACE, plus an index
+# within the kind
+DISPLAY_KEY_SPACE = 1 << 40
+KEY_HUD = 0
+KEY_WALL = 1
+KEY_DRAKE = 2
+#keys set aside for each wall's projected outline
+WALL_KEY_LINES = 8
 #endregion
 ################ Helper Functions #############################################
 #region
@@ -104,10 +255,37 @@ def quick_distance(pos_a: vec2, pos_b: vec2) -> float:
     dy = abs(pos_a[1] - pos_b[1])
     return dx + dy
 
+def segment_distance(point: vec2, pos_a: vec2, pos_b: vec2) -> float:
+    """ distance from point to the nearest point of the segment """
+
+    (x, y) = point
+    (dx, dy) = (pos_b[0] - pos_a[0], pos_b[1] - pos_a[1])
+    length = dx*dx + dy*dy
+    t = 0.0
+    if length > 0:
+        t = min(max(((x - pos_a[0])*dx + (y - pos_a[1])*dy) / length, 0.0), 1.0)
+    return math.hypot(x - (pos_a[0] + t*dx), y - (pos_a[1] + t*dy))
+
 def near(a: float, b: float) -> bool:
 
     return abs(a - b) < 0.01
 
+def edge_key(pos_a: vec2, pos_b: vec2) -> tuple[ivec2, ivec2]:
+    """ 
+        hashable key for a segment, the same whichever way round 
+        it's given. Points are rounded to hundredths, the tolerance 
+        near() works to.
+    """
+
+    key_a = (int(math.floor(pos_a[0]*100 + 0.5)), int(math.floor(pos_a[1]*100 + 0.5)))
+    key_b = (int(math.floor(pos_b[0]*100 + 0.5)), int(math.floor(pos_b[1]*100 + 0.5)))
+    return (min(key_a, key_b), max(key_a, key_b))
+
+def display_key(kind: int, index: int | np.ndarray) -> int | np.ndarray:
+    """ display list key of the index'th piece of geometry of a kind """
+
+    return kind*DISPLAY_KEY_SPACE + index
+
 def world_to_view_transform(
     point: vec2,
     camera_position: vec2, 
@@ -169,82 +347,1636 @@ def view_to_screen_transform(
         points[i] = round(translate(points[i],CENTER))
 
     return points
+#endregion
+################ Camera        ################################################
+#region
+class Camera:
+    """
+        World to view transform for one frame.
 
-def view_to_screen_transform_simple(
-    pos_a: vec2, pos_b: vec2, 
-    z_a: float, z_b: float, z_camera: float) -> list[ivec2] | None:
-    
-    #fetch the top-down coordinates
-    (x_a,depth_a) = pos_a
-    (x_b,depth_b) = pos_b
+        The rotation is worked out once, rather than for every point.
+        Views can also keep view-space results in the camera's cache,
+        which lives exactly as long as the camera's pose.
+    """
 
-    if depth_a >= 0 and depth_b >= 0:
-        #Both endpoints behind player
-        return None
 
-    if depth_a >= 0:
-        #Endpoint A behind player, clip it.
-        (x_a,depth_a) = clip_line((pos_a, pos_b), NEAR_PLANE)
+    def __init__(self, position: vec2, direction: float, z: float):
 
-    if depth_b >= 0:
-        #Endpoint B behind player, clip it.
-        (x_b,depth_b) = clip_line((pos_a, pos_b), NEAR_PLANE)
+        self.position = position
+        self.direction = direction
+        self.z = z
+        self.pose = (position, direction, z)
+
+        #rotate 90 degrees counter clockwise, 
+        # then opposite camera motion
+        theta = math.radians(90 - direction)
+        self.cos = math.cos(theta)
+        self.sin = math.sin(theta)
+        self.translation = (-position[0], -position[1])
+
+        self.cache: dict = {}
+
+    @staticmethod
+    def from_player(player: "Player", previous: "Camera" = None) -> "Camera":
+        """ 
+            camera for the player's current pose, the previous camera
+            (and everything cached on it) is reused if they haven't moved.
+        """
+
+        return Camera.from_pose(Camera.player_pose(player), previous)
+
+    @staticmethod
+    def player_pose(player: "Player") -> tuple[vec2, float, float]:
+
+        return (player.get_position(), player.direction, player.get_top())
+
+    @staticmethod
+    def from_pose(
+        pose: tuple[vec2, float, float], previous: "Camera" = None) -> "Camera":
+
+        if previous is not None and previous.pose == pose:
+            return previous
+        return Camera(*pose)
+
+    @staticmethod
+    def interpolate(
+        pose_a: tuple[vec2, float, float], pose_b: tuple[vec2, float, float], 
+        alpha: float) -> tuple[vec2, float, float]:
+        """ pose alpha of the way from a to b, turning the short way round """
+
+        if alpha <= 0 or pose_a == pose_b:
+            return pose_a
+        if alpha >= 1:
+            return pose_b
+        ((x_a, y_a), direction_a, z_a) = pose_a
+        ((x_b, y_b), direction_b, z_b) = pose_b
+        turn = (direction_b - direction_a + 180) % 360 - 180
+        return (
+            (x_a + (x_b - x_a)*alpha, y_a + (y_b - y_a)*alpha),
+            (direction_a + turn*alpha) % 360,
+            z_a + (z_b - z_a)*alpha)
+
+    def to_view(self, point: vec2) -> vec2:
+        """ same result as world_to_view_transform """
+
+        x = point[0] + self.translation[0]
+        y = point[1] + self.translation[1]
+        return (x*self.cos + y*self.sin, -x*self.sin + y*self.cos)
+
+    def frustum_code(self, point: vec2, margin: float = 0.0) -> int:
+        """ 
+            FRUSTUM_LEFT or FRUSTUM_RIGHT if the point is more than margin
+            outside that side of the view, 0 if it's within both.
+            Something is off screen when all its points share a code.
+        """
+
+        (x, depth) = self.to_view(point)
+        depth *= FRUSTUM_SLOPE
+        margin *= math.hypot(1, FRUSTUM_SLOPE)
+        code = 0
+        if x - depth < -margin:
+            code |= FRUSTUM_LEFT
+        if x + depth > margin:
+            code |= FRUSTUM_RIGHT
+        return code
+
+    def frustum_codes(self, 
+        x: np.ndarray, y: np.ndarray, margin: float | np.ndarray = 0.0) -> np.ndarray:
+        """ frustum_code for arrays of points """
+
+        x = x + self.translation[0]
+        y = y + self.translation[1]
+        view_x = x*self.cos + y*self.sin
+        depth = (-x*self.sin + y*self.cos)*FRUSTUM_SLOPE
+        margin = margin*math.hypot(1, FRUSTUM_SLOPE)
+        return (
+            np.where(view_x - depth < -margin, FRUSTUM_LEFT, 0)
+            | np.where(view_x + depth > margin, FRUSTUM_RIGHT, 0))
 
-    #Depth correction, work out height for top and bottom,
-    #then divide by depth
-    depth_a *= -1
-    depth_a = max(depth_a,0.01)
-    x_a = x_a / depth_a
-    y_a = -(z_a - z_camera)/depth_a
+    def cached(self, key, build: Callable[[], object]) -> object:
 
-    depth_b *= -1
-    depth_b = max(depth_b,0.01)
-    x_b = x_b / depth_b
-    y_b = -(z_b - z_camera) / depth_b
+        if key not in self.cache:
+            self.cache[key] = build()
+        return self.cache[key]
+#endregion
+################ Batch Projection #############################################
+#region
+class WallTable:
+    """
+        Wall and door geometry packed into arrays, 
+        one row per wall, for batched projection.
+    """
+
+
+    def __init__(self, walls: list["Wall"]):
+
+        self.walls = walls
+        count = len(walls)
+        self.pos_a = np.array([wall.pos_a for wall in walls], dtype = float).reshape(count, 2)
+        self.pos_b = np.array([wall.pos_b for wall in walls], dtype = float).reshape(count, 2)
+        self.normal = np.array([wall.normal for wall in walls], dtype = float).reshape(count, 2)
+        self.backface_visible = np.array(
+            [wall.backface_visible for wall in walls], dtype = bool)
+        self.z_bottom = np.array([wall.z for wall in walls], dtype = float)
+        self.z_top = np.array([wall.z + wall.height for wall in walls], dtype = float)
+
+    def __len__(self) -> int:
+
+        return len(self.walls)
+
+    @staticmethod
+    def merge(tables: list["WallTable"]) -> "WallTable":
+        """ 
+            concatenate tables, doors shared by two rooms 
+            are only kept once 
+        """
+
+        merged = WallTable([])
+        if len(tables) == 0:
+            return merged
+
+        seen = set()
+        rows = []
+        row = 0
+        for table in tables:
+            for wall in table.walls:
+                if id(wall) not in seen:
+                    seen.add(id(wall))
+                    merged.walls.append(wall)
+                    rows.append(row)
+                row += 1
+
+        for name in ("pos_a", "pos_b", "normal", "backface_visible", "z_bottom", "z_top"):
+            column = np.concatenate([getattr(table, name) for table in tables])
+            setattr(merged, name, column[rows])
+        return merged
+
+    def take(self, rows: np.ndarray) -> "WallTable":
+
+        table = WallTable([])
+        table.walls = [self.walls[row] for row in rows.tolist()]
+        for name in ("pos_a", "pos_b", "normal", "backface_visible", "z_bottom", "z_top"):
+            setattr(table, name, getattr(self, name)[rows])
+        return table
+
+def walls_in_frustum(table: WallTable, camera: Camera) -> np.ndarray:
+    """ rows of the walls not wholly off one side of the view """
+
+    codes_a = camera.frustum_codes(table.pos_a[:,0], table.pos_a[:,1])
+    codes_b = camera.frustum_codes(table.pos_b[:,0], table.pos_b[:,1])
+    return np.flatnonzero((codes_a & codes_b) == 0)
+
+def rects_in_frustum(rects: np.ndarray, camera: Camera) -> np.ndarray:
+    """ mask of the (x, y, width, height) boxes not wholly off one side of the view """
+
+    x = rects[:,0]
+    y = rects[:,1]
+    right = x + rects[:,2]
+    top = y + rects[:,3]
+    codes = (camera.frustum_codes(x, y) & camera.frustum_codes(x, top)
+        & camera.frustum_codes(right, y) & camera.frustum_codes(right, top))
+    return codes == 0
+
+def project_walls(
+    table: WallTable, camera: Camera, 
+    spans: bool = False) -> tuple[np.ndarray, ...]:
+    """
+        Batched equivalent of GameView.draw_wall's projection.
+
+        Returns the indices of the walls which survive backface 
+        culling and near plane clipping, and their screen edge 
+        tables as an (n, 4, 2) integer array, identical to what
+        view_to_screen_transform returns for each wall.
+
+        With spans, also returns the unrounded screen x and the 
+        depth of both ends as an (n, 2, 2) array, for occlusion.
+    """
+
+    if len(table) == 0:
+        if spans:
+            return (np.zeros(0, dtype = int), np.zeros((0, 4, 2), dtype = int), 
+                np.zeros((0, 2, 2), dtype = float))
+        return np.zeros(0, dtype = int), np.zeros((0, 4, 2), dtype = int)
+
+    (camera_x, camera_y) = camera.position
+    camera_z = camera.z
+
+    #backface test
+    to_viewer_x = camera_x + -table.pos_a[:,0]
+    to_viewer_y = camera_y + -table.pos_a[:,1]
+    facing = to_viewer_x*table.normal[:,0] + to_viewer_y*table.normal[:,1]
+    keep = (facing >= 0) | table.backface_visible
+
+    #world to view
+    cos = camera.cos
+    sin = camera.sin
+    ax = table.pos_a[:,0] + -camera_x
+    ay = table.pos_a[:,1] + -camera_y
+    bx = table.pos_b[:,0] + -camera_x
+    by = table.pos_b[:,1] + -camera_y
+    x_a = ax*cos + ay*sin
+    depth_a = -ax*sin + ay*cos
+    x_b = bx*cos + by*sin
+    depth_b = -bx*sin + by*cos
+
+    #Both endpoints behind player
+    keep &= (depth_a < 0) | (depth_b < 0)
+    indices = np.flatnonzero(keep)
+    x_a = x_a[indices]
+    depth_a = depth_a[indices]
+    x_b = x_b[indices]
+    depth_b = depth_b[indices]
+
+    #near plane clipping, same arithmetic as clip_line
+    ((x3,y3),(x4,y4)) = NEAR_PLANE
+    num_b = (x3*y4 - y3*x4)
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        num_a = (x_a*depth_b - depth_a*x_b)
+        den = (x_a - x_b)*(y3 - y4) - (depth_a - depth_b)*(x3 - x4)
+        clip_x = (num_a*(x3 - x4) - (x_a - x_b)*num_b)/den
+        clip_depth = (num_a*(y3 - y4) - (depth_a - depth_b)*num_b)/den
+    behind_a = depth_a >= 0
+    behind_b = depth_b >= 0
+    x_a = np.where(behind_a, clip_x, x_a)
+    depth_a = np.where(behind_a, clip_depth, depth_a)
+    x_b = np.where(behind_b, clip_x, x_b)
+    depth_b = np.where(behind_b, clip_depth, depth_b)
+
+    #perspective divide
+    depth_a = np.maximum(-depth_a, 0.01)
+    depth_b = np.maximum(-depth_b, 0.01)
+    top = -(table.z_top[indices] - camera_z)
+    bottom = -(table.z_bottom[indices] - camera_z)
+
+    points = np.empty((len(indices), 4, 2), dtype = float)
+    points[:,0,0] = x_a / depth_a
+    points[:,0,1] = top / depth_a
+    points[:,1,0] = x_b / depth_b
+    points[:,1,1] = top / depth_b
+    points[:,2,0] = points[:,1,0]
+    points[:,2,1] = bottom / depth_b
+    points[:,3,0] = points[:,0,0]
+    points[:,3,1] = bottom / depth_a
+
+    points[:,:,0] = points[:,:,0]*(SCREEN_WIDTH//2) + CENTER[0]
+    points[:,:,1] = points[:,:,1]*(SCREEN_HEIGHT//2) + CENTER[1]
+    if spans:
+        ends = np.empty((len(indices), 2, 2), dtype = float)
+        ends[:,0,0] = points[:,0,0]
+        ends[:,0,1] = depth_a
+        ends[:,1,0] = points[:,1,0]
+        ends[:,1,1] = depth_b
+        return indices, points.astype(int), ends
+    return indices, points.astype(int)
+
+class ModelMesh:
+    """
+        A wireframe model compiled to a vertex array and one 
+        segment index array per coloured part, with the parts
+        to draw at each level of detail.
+    """
 
-    points = [
-                (x_a,y_a),
-                (x_b,y_b)
-            ]
+
+    def __init__(self, 
+        model: dict[int, tuple], colors: dict[int, str], 
+        loops: tuple[int] = (), 
+        lods: tuple[tuple[int]] = None, lod_pixels: tuple[float] = (0,),
+        line_budget: int = None):
+        """ 
+            parts listed in loops are closed back to their first point,
+            without lods every part is drawn at any size
+        """
+
+        vertices: dict[tuple, int] = {}
+
+        def vertex(point: tuple) -> int:
+            return vertices.setdefault(point, len(vertices))
+
+        self.parts: dict[int, tuple[str, np.ndarray]] = {}
+        #where each part's segments start when all are numbered together
+        self.part_offsets: dict[int, int] = {}
+        self.line_count = 0
+        for part, segments in model.items():
+            indices = [(vertex(pos_a), vertex(pos_b)) for pos_a, pos_b in segments]
+            if part in loops and indices[-1][1] != indices[0][0]:
+                indices.append((indices[-1][1], indices[0][0]))
+            self.parts[part] = (colors[part], np.array(indices, dtype = int))
+            self.part_offsets[part] = self.line_count
+            self.line_count += len(indices)
+
+        if lods is None:
+            lods = (tuple(model),)
+        self.lods = lods
+        self.lod_pixels = np.array(lod_pixels, dtype = float)
+        self.line_budget = line_budget
+        #lines drawn per instance at each level, nothing past the last
+        self.lod_lines = np.array(
+            [sum(len(self.parts[part][1]) for part in parts) for parts in lods] + [0])
+
+        points = np.array(list(vertices), dtype = float)
+        self.x = points[:,0]
+        self.depth = points[:,1]
+        self.z = points[:,2]
+        self.height = self.z.max() - self.z.min()
+        self.radius = np.abs(self.x).max()
+
+    def detail_levels(self, pixels: np.ndarray) -> np.ndarray:
+        """ 
+            level of detail for each projected height, len(lods) to skip.
+            Over the line budget, the height each level needs is raised
+            until it fits, so instances lose detail a level at a time, 
+            smallest first, and the farthest are dropped before the 
+            nearest lose theirs.
+        """
+
+        levels = np.searchsorted(-self.lod_pixels, -pixels)
+        lines = self.lod_lines[levels].sum()
+        if self.line_budget is None or lines <= self.line_budget:
+            return levels
+
+        #every step down still open to each instance: how far the 
+        # heights must be raised for it to happen and the lines it saves
+        skip = len(self.lods)
+        steps = skip - levels
+        (instance, step) = runs(steps)
+        level = levels[instance] + step
+        scale = pixels[instance] / self.lod_pixels[level]
+        saved = self.lod_lines[level] - self.lod_lines[level + 1]
+        #smallest raise first, the smaller instance first on a tie
+        order = np.lexsort((pixels[instance], scale))
+        taken = np.searchsorted(np.cumsum(saved[order]), lines - self.line_budget) + 1
+        return levels + np.bincount(instance[order[:taken]], minlength = pixels.shape[0])
+
+DRAKE_MESH = ModelMesh(
+    DRAKE_MODEL, DRAKE_COLORS, loops = (DRAKE_BODY, DRAKE_FACE),
+    lods = DRAKE_LODS, lod_pixels = DRAKE_LOD_PIXELS, 
+    line_budget = DRAKE_LINE_BUDGET)
+
+def instances_in_frustum(
+    mesh: ModelMesh, pool: "EntityPool", slots: np.ndarray, 
+    camera: Camera) -> np.ndarray:
+    """ the slots whose instance isn't wholly off one side of the view """
+
+    codes = camera.frustum_codes(
+        pool.x[slots], pool.y[slots], pool.size[slots]/2*mesh.radius)
+    return slots[codes == 0]
+
+def instances_unoccluded(
+    mesh: ModelMesh, pool: "EntityPool", slots: np.ndarray, 
+    camera: Camera, buffer: "ColumnBuffer") -> np.ndarray:
+    """ the slots whose instance isn't wholly behind the walls in the buffer """
+
+    x = pool.x[slots] + camera.translation[0]
+    y = pool.y[slots] + camera.translation[1]
+    view_x = x*camera.cos + y*camera.sin
+    depth = -(-x*camera.sin + y*camera.cos)
+    radius = pool.size[slots]/2*mesh.radius
+    nearest = np.maximum(depth - radius, 0.01)
+    far = np.maximum(depth + radius, 0.01)
+    #widest the instance can be on screen
+    left = np.minimum((view_x - radius) / nearest, (view_x - radius) / far)
+    right = np.maximum((view_x + radius) / nearest, (view_x + radius) / far)
+    left = left * (SCREEN_WIDTH//2) + CENTER[0]
+    right = right * (SCREEN_WIDTH//2) + CENTER[0]
+
+    keep = [
+        i for i, (x_a, x_b, depth) in enumerate(zip(
+            left.tolist(), right.tolist(), nearest.tolist()))
+        if not buffer.hidden(x_a, x_b, depth, depth)
+    ]
+    return slots[keep]
+
+def project_instances(
+    mesh: ModelMesh, pool: "EntityPool", slots: np.ndarray, 
+    camera: Camera, keys: bool = False) -> list[tuple[str, np.ndarray]]:
+    """
+        Project every instance of a model at once, the model 
+        scaled by half the entity's size and facing the camera.
+        Each instance only gets the parts of its level of detail.
+
+        Returns (colour, (n, 4) integer line array) per colour, 
+        each line being x_a, y_a, x_b, y_b on screen. With keys, 
+        also each line's slot*mesh.line_count + segment number.
+    """
+
+    #world to view, as Camera.to_view
+    x = pool.x[slots] + camera.translation[0]
+    y = pool.y[slots] + camera.translation[1]
+    view_x = x*camera.cos + y*camera.sin
+    view_depth = -x*camera.sin + y*camera.cos
+    scale = pool.size[slots]/2
+
+    #the models are flat, so an instance is either wholly 
+    # in front of the camera or culled
+    depth = scale[:,None]*mesh.depth + view_depth[:,None]
+    front = np.flatnonzero((depth < 0).all(axis = 1))
+    depth = np.maximum(-depth[front], 0.01)
+    scale = scale[front,None]
+    levels = mesh.detail_levels(
+        (scale*mesh.height*(SCREEN_HEIGHT//2) / depth).min(axis = 1))
+
+    #perspective divide, same arithmetic as view_to_screen_transform
+    screen_x = (scale*mesh.x + view_x[front,None]) / depth
+    screen_y = -(scale*mesh.z - camera.z) / depth
+    screen_x = (screen_x*(SCREEN_WIDTH//2) + CENTER[0]).astype(int)
+    screen_y = (screen_y*(SCREEN_HEIGHT//2) + CENTER[1]).astype(int)
+
+    lines: dict[str, list[np.ndarray]] = {}
+    line_keys: dict[str, list[np.ndarray]] = {}
+    for level, parts in enumerate(mesh.lods):
+        rows = np.flatnonzero(levels == level)
+        if rows.shape[0] == 0:
+            continue
+        for part in parts:
+            color, segments = mesh.parts[part]
+            a = segments[:,0]
+            b = segments[:,1]
+            table = np.stack((
+                screen_x[rows[:,None],a], screen_y[rows[:,None],a],
+                screen_x[rows[:,None],b], screen_y[rows[:,None],b]), axis = -1)
+            lines.setdefault(color, []).append(table.reshape(-1, 4))
+            if keys:
+                first = slots[front[rows]]*mesh.line_count + mesh.part_offsets[part]
+                line_keys.setdefault(color, []).append(
+                    (first[:,None] + np.arange(segments.shape[0])).reshape(-1))
+    if keys:
+        return [
+            (color, np.concatenate(tables), np.concatenate(line_keys[color])) 
+            for color, tables in lines.items()]
+    return [(color, np.concatenate(tables)) for color, tables in lines.items()]
+#endregion
+################ Level Data    ################################################
+#region
+class LevelData:
+    """
+        The level as flat arrays, one row per room, sector and door.
+
+        This is what the text parser produces and what the compiled
+        level cache stores, Scene wires its objects up from it.
+        Sector links hold the index of the neighbour across each 
+        edge, in EDGES order, or -1.
+    """
+
+
+    def __init__(self):
+
+        self.room_tags: list[str] = []
+        self.sector_tags: list[str] = []
+        self.door_tags: list[str] = []
+        #x, y, width, height in world units
+        self.sector_rects = np.zeros((0, 4), dtype = np.float64)
+        #n, e, s, w wall flags
+        self.sector_sides = np.zeros((0, 4), dtype = np.uint8)
+        self.sector_rooms = np.zeros(0, dtype = np.int32)
+        self.sector_links = np.zeros((0, 4), dtype = np.int32)
+        #x_a, y_a, x_b, y_b in world units
+        self.door_points = np.zeros((0, 4), dtype = np.float64)
+        #room_lu, room_rd
+        self.door_rooms = np.zeros((0, 2), dtype = np.int32)
+        #x, y, direction, room
+        self.player = np.zeros(4, dtype = np.float64)
+        #keeps a memory mapped cache open while arrays point into it
+        self.buffer = None
+
+    @staticmethod
+    def parse(filename: str) -> "LevelData":
+
+        parser = LevelParser()
+        with open(filename,'r') as f:
+            line:str = f.readline()
+            while line:
+                tag,_,rest = line.partition("(")
+                parameters,_,_ = rest.partition(")")
+                parameters = parameters.split(",")
+
+                match tag[0]:
+                    case "r":
+                        parser.add_room(tag)
+                    case 's':
+                        parser.add_sector(tag, parameters)
+                    case 'd':
+                        parser.add_door(tag, parameters)
+                    case 'p':
+                        parser.add_player(tag, parameters)
+                
+                line = f.readline()
+
+        return parser.finish()
+
+    def sector_count(self) -> int:
+
+        return len(self.sector_tags)
+
+    def door_count(self) -> int:
+
+        return len(self.door_tags)
+
+    def connect(self) -> None:
+        """ 
+            fill in sector_links, sectors sharing an edge are 
+            neighbours across it 
+        """
+
+        links = np.full((self.sector_count(), 4), -1, dtype = np.int32)
+        #quantized edge -> (sector, edge number) waiting for a neighbour
+        open_edges: dict[tuple[ivec2, ivec2], tuple[int, int]] = {}
+
+        for i, (x, y, width, height) in enumerate(self.sector_rects.tolist()):
+            corners = (
+                (x, y), (x, y + height), 
+                (x + width, y + height), (x + width, y)
+            )
+            for edge in range(4):
+                key = edge_key(corners[edge], corners[(edge + 1) % 4])
+                other = open_edges.pop(key, None)
+                if other is None:
+                    open_edges[key] = (i, edge)
+                    continue
+
+                (j, other_edge) = other
+                links[i, edge] = j
+                links[j, other_edge] = i
+
+        self.sector_links = links
+
+    def header(self, source: "SourceStamp") -> tuple[bytes, bytes]:
+        """ a compiled level's header and tag block """
+
+        tags = "\n".join(self.room_tags + self.sector_tags + self.door_tags).encode("utf-8")
+        header = struct.pack(
+            LEVEL_CACHE_HEADER, LEVEL_CACHE_MAGIC, LEVEL_CACHE_VERSION,
+            source.digest, source.size, source.mtime_ns,
+            len(self.room_tags), self.sector_count(), self.door_count(),
+            len(tags)
+        )
+        return header, tags
+
+    def write(self, filename: str, source: "SourceStamp") -> None:
+        """ save as a compiled level, replacing any old one in one go """
+
+        (header, tags) = self.header(source)
+        temporary = filename + ".tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(header)
+                f.write(tags)
+                for array in self.arrays():
+                    f.write(b"\0" * (-f.tell() % 8))
+                    f.write(np.ascontiguousarray(array).tobytes())
+            os.replace(temporary, filename)
+        except BaseException:
+            #don't leave half a cache lying about
+            with contextlib.suppress(OSError):
+                os.remove(temporary)
+            raise
+
+    def stamp(self, filename: str, source: "SourceStamp") -> None:
+        """ 
+            rewrite a compiled level's source stamp in place, for a 
+            source that was touched but not changed 
+        """
+
+        (header, _) = self.header(source)
+        with open(filename, "r+b") as f:
+            f.write(header)
+
+    @staticmethod
+    def read(filename: str, source: "SourceStamp") -> "LevelData | None":
+        """ 
+            memory map a compiled level, None if it's missing, 
+            damaged or was compiled from a different source 
+        """
+
+        try:
+            with open(filename, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        data = None
+        try:
+            data = LevelData.unpack(buffer, source)
+            return data
+        finally:
+            if data is None:
+                buffer.close()
+
+    @staticmethod
+    def unpack(buffer: mmap.mmap, source: "SourceStamp") -> "LevelData | None":
+        """ the level in a mapped compiled level, None if it doesn't belong to source """
+
+        try:
+            (magic, version, digest, size, mtime_ns,
+                rooms, sectors, doors, tag_bytes) = struct.unpack_from(LEVEL_CACHE_HEADER, buffer)
+        except struct.error:
+            return None
+        if magic != LEVEL_CACHE_MAGIC or version != LEVEL_CACHE_VERSION \
+            or not source.matches(digest, size, mtime_ns):
+            return None
+
+        data = LevelData()
+        offset = struct.calcsize(LEVEL_CACHE_HEADER)
+        tags = bytes(buffer[offset:offset + tag_bytes]).decode("utf-8")
+        tags = tags.split("\n") if tag_bytes > 0 else []
+        if len(tags) != rooms + sectors + doors:
+            return None
+        data.room_tags = tags[:rooms]
+        data.sector_tags = tags[rooms:rooms + sectors]
+        data.door_tags = tags[rooms + sectors:]
+        offset += tag_bytes
+
+        shapes = (
+            (sectors, 4), (sectors, 4), (sectors,), (sectors, 4), 
+            (doors, 4), (doors, 2), (4,)
+        )
+        try:
+            arrays = []
+            for array, shape in zip(data.arrays(), shapes):
+                offset += -offset % 8
+                count = int(np.prod(shape))
+                arrays.append(np.frombuffer(
+                    buffer, dtype = array.dtype, count = count, offset = offset).reshape(shape))
+                offset += count*array.dtype.itemsize
+        except ValueError:
+            return None
+
+        (data.sector_rects, data.sector_sides, data.sector_rooms, data.sector_links,
+            data.door_points, data.door_rooms, data.player) = arrays
+        data.buffer = buffer
+        return data
+
+    def arrays(self) -> tuple[np.ndarray]:
+        """ the packed arrays, in file order """
+
+        return (
+            self.sector_rects, self.sector_sides, self.sector_rooms, self.sector_links,
+            self.door_points, self.door_rooms, self.player
+        )
+
+class LevelParser:
+    """ collects the records of a text level into a LevelData """
+
+
+    def __init__(self):
+
+        self.data = LevelData()
+        self.room_numbers: dict[str, int] = {}
+        self.sector_rects: list[tuple] = []
+        self.sector_sides: list[tuple] = []
+        self.sector_rooms: list[int] = []
+        self.door_points: list[tuple] = []
+        self.door_rooms: list[tuple] = []
+        self.player = (0.0, 0.0, 0.0, -1)
+
+    def add_room(self, tag: str):
+
+        #room
+        # r()
+        self.room_numbers[tag] = len(self.data.room_tags)
+        self.data.room_tags.append(tag)
     
-    for i in range(len(points)):
-        points[i] = scale(points[i],SCREEN_WIDTH//2,SCREEN_HEIGHT//2)
-        points[i] = round(translate(points[i],CENTER))
+    def add_sector(self, tag: str, parameters: list[str]):
+        
+        #sector
+        # s(x,y,width,height,n,e,s,w,room)
+        x      = 32*float(parameters[0])
+        y      = 32*(50-float(parameters[1]))
+        width  = 32*float(parameters[2])
+        height = 32*float(parameters[3])
+        n      = int(parameters[4])
+        e      = int(parameters[5])
+        s      = int(parameters[6])
+        w      = int(parameters[7])
+        room   = parameters[8]
 
-    return points
+        self.data.sector_tags.append(tag)
+        self.sector_rects.append((x, y, width, height))
+        self.sector_sides.append((n, e, s, w))
+        self.sector_rooms.append(self.room_numbers[room])
+    
+    def add_door(self, tag: str, parameters: list[str]):
+
+        #door
+        # s(x_a,y_a,x_b,y_b,room_lu,room_rd)
+        x_a     = 32*float(parameters[0])
+        y_a     = 32*(50-float(parameters[1]))
+        x_b     = 32*float(parameters[2])
+        y_b     = 32*(50-float(parameters[3]))
+        room_lu = self.room_numbers[parameters[4].strip()]
+        room_rd = self.room_numbers[parameters[5].strip()]
+
+        self.data.door_tags.append(tag)
+        self.door_points.append((x_a, y_a, x_b, y_b))
+        self.door_rooms.append((room_lu, room_rd))
+    
+    def add_player(self, tag: str, parameters: list[str]):
+
+        #player
+        # p(x,y,direction,room)
+        x         = 32*float(parameters[0])
+        y         = 32*(50-float(parameters[1]))
+        direction = float(parameters[2])
+        room      = self.room_numbers[parameters[3].strip()]
+
+        self.player = (x, y, direction, room)
+
+    def finish(self) -> LevelData:
+
+        data = self.data
+        data.sector_rects = np.array(self.sector_rects, dtype = np.float64).reshape(-1, 4)
+        data.sector_sides = np.array(self.sector_sides, dtype = np.uint8).reshape(-1, 4)
+        data.sector_rooms = np.array(self.sector_rooms, dtype = np.int32)
+        data.door_points = np.array(self.door_points, dtype = np.float64).reshape(-1, 4)
+        data.door_rooms = np.array(self.door_rooms, dtype = np.int32).reshape(-1, 2)
+        data.player = np.array(self.player, dtype = np.float64)
+        data.connect()
+        return data
+
+class SourceStamp:
+    """ identifies a level file's contents, to tell whether a cache is stale """
+
+
+    def __init__(self, filename: str):
+
+        self.filename = filename
+        stat = os.stat(filename)
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self._digest: bytes = None
+        #set when a touched file hashed the same, its cache wants restamping
+        self.touched = False
+
+    @property
+    def digest(self) -> bytes:
+        """ sha1 of the file, only read if someone asks """
+
+        if self._digest is None:
+            with open(self.filename, "rb") as f:
+                self._digest = hashlib.sha1(f.read()).digest()
+        return self._digest
+
+    def matches(self, digest: bytes, size: int, mtime_ns: int) -> bool:
+        """ an untouched file is trusted, a touched one must hash the same """
+
+        if size != self.size:
+            return False
+        if mtime_ns == self.mtime_ns:
+            return True
+        self.touched = digest == self.digest
+        return self.touched
+
+def load_level(filename: str, use_cache: bool = True) -> LevelData:
+    """
+        Level data for a text level, from its compiled cache when 
+        that is up to date, otherwise parsed (and the cache rebuilt).
+    """
+
+    if not use_cache:
+        return LevelData.parse(filename)
+
+    source = SourceStamp(filename)
+    cache = filename + LEVEL_CACHE_SUFFIX
+    data = LevelData.read(cache, source)
+    if data is not None:
+        if source.touched:
+            #so the next load trusts the new mtime instead of hashing again
+            with contextlib.suppress(OSError):
+                data.stamp(cache, source)
+        return data
+
+    data = LevelData.parse(filename)
+    try:
+        data.write(cache, source)
+    except OSError:
+        #read only location, run from the text
+        pass
+    return data
+#endregion
+################ Movement      ################################################
+#region
+class SectorMap:
+    """
+        The level's sectors as arrays, for moving many agents at once.
+
+        Per sector its bounds, a bit per edge in EDGES order saying 
+        whether a wall or closed door blocks it, and the neighbour 
+        across each edge, -1 for none. A grid of sector rows finds 
+        the sector under a point where an edge has no single neighbour.
+    """
+
+
+    def __init__(self, level: LevelData, cell_size: float = GRID_CELL_SIZE):
+
+        rects = level.sector_rects
+        self.low = rects[:,:2]
+        self.high = rects[:,:2] + rects[:,2:]
+        #low x, low y, high x, high y
+        self.bounds = np.concatenate((self.low, self.high), axis = 1)
+        walls = level.sector_sides[:,[EDGE_SIDES[edge] for edge in EDGES]].astype(np.uint8)
+        self.walls = (walls << np.arange(4, dtype = np.uint8)).sum(axis = 1).astype(np.uint8)
+        self.blocking = self.walls.copy()
+        self.links = level.sector_links
+        #(row, edge) of the sector edges each door lies on, doors start closed
+        self.door_edges: list[list[tuple[int, int]]] = [[] for _ in range(level.door_count())]
+        self.door_closed = np.ones(level.door_count(), dtype = np.bool_)
+        #counts door changes, for whoever caches what's reachable
+        self.door_revision = 0
+
+        #sector rows filed under every cell they overlap, edges included
+        self.cell_size = cell_size
+        self.origin = self.low.min(axis = 0) if rects.shape[0] else np.zeros(2)
+        first = np.floor((self.low - self.origin) / cell_size).astype(int)
+        last = np.floor((self.high - self.origin) / cell_size).astype(int)
+        self.shape = last.max(axis = 0) + 1 if rects.shape[0] else np.ones(2, dtype = int)
+        spans = last - first + 1
+        sector, k = runs(spans[:,0]*spans[:,1])
+        cells = (first[sector,1] + k // spans[sector,0])*self.shape[0] \
+            + first[sector,0] + k % spans[sector,0]
+        order = np.argsort(cells, kind = "stable")
+        self.cell_rows = sector[order].astype(np.int32)
+        cell_count = int(self.shape[0]*self.shape[1])
+        self.cell_start = np.searchsorted(cells[order], np.arange(cell_count))
+        self.cell_count = np.bincount(cells, minlength = cell_count)
+        self.cell_depth = int(self.cell_count.max(initial = 0))
+
+        self.link_doors(level)
+
+    def link_doors(self, level: LevelData) -> None:
+        """ find the sector edges each door lies on """
+
+        for door, (x_a, y_a, x_b, y_b) in enumerate(level.door_points.tolist()):
+            (rows,) = self.candidates(np.array([(x_a + x_b)/2]), np.array([(y_a + y_b)/2]))
+            for row in rows.tolist():
+                (low_x, low_y), (high_x, high_y) = self.low[row], self.high[row]
+                if near(x_a, x_b):
+                    #vertical door, on a west or east edge
+                    edges = ((0, low_x), (2, high_x))
+                    (along, low, high) = ((y_a, y_b), low_y, high_y)
+                    across = x_a
+                else:
+                    #horizontal door, on a north or south edge
+                    edges = ((3, low_y), (1, high_y))
+                    (along, low, high) = ((x_a, x_b), low_x, high_x)
+                    across = y_a
+                for edge, position in edges:
+                    if near(across, position) \
+                        and low - 0.01 <= min(along) and max(along) <= high + 0.01:
+                        self.door_edges[door].append((row, edge))
+                        self.blocking[row] |= 1 << edge
+
+    def set_door(self, door: int, closed: bool) -> None:
+
+        if self.door_closed[door] != closed:
+            self.door_revision += 1
+        self.door_closed[door] = closed
+        for row, edge in self.door_edges[door]:
+            if closed or self.walls[row] & (1 << edge):
+                self.blocking[row] |= 1 << edge
+            else:
+                self.blocking[row] &= 15 ^ (1 << edge)
+
+    def rows_at(self, pos: vec2) -> np.ndarray:
+        """ rows filed under one point's cell """
+
+        cell_x = math.floor((pos[0] - self.origin[0]) / self.cell_size)
+        cell_y = math.floor((pos[1] - self.origin[1]) / self.cell_size)
+        if not (0 <= cell_x < self.shape[0] and 0 <= cell_y < self.shape[1]):
+            return self.cell_rows[:0]
+        cell = cell_y*self.shape[0] + cell_x
+        start = self.cell_start[cell]
+        return self.cell_rows[start:start + self.cell_count[cell]]
+
+    def candidates(self, x: np.ndarray, y: np.ndarray) -> list[np.ndarray]:
+        """ rows filed under each point's cell """
+
+        (cell_x, cell_y, inside) = self.cells(x, y)
+        return [
+            self.cell_rows[self.cell_start[cell]:self.cell_start[cell] + self.cell_count[cell]]
+            if ok else self.cell_rows[:0]
+            for cell, ok in zip((cell_y*self.shape[0] + cell_x).tolist(), inside.tolist())
+        ]
+
+    def cells(self, x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray]:
+        """ grid cell of each point, and whether it's on the grid """
+
+        cell_x = np.floor((x - self.origin[0]) / self.cell_size).astype(int)
+        cell_y = np.floor((y - self.origin[1]) / self.cell_size).astype(int)
+        inside = (cell_x >= 0) & (cell_x < self.shape[0]) \
+            & (cell_y >= 0) & (cell_y < self.shape[1])
+        return cell_x, cell_y, inside
+
+    def contains(self, rows: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """ whether each point is in the sector of the same row, edges included """
+
+        bounds = self.bounds[rows]
+        return (x >= bounds[:,0]) & (x <= bounds[:,2]) & (y >= bounds[:,1]) & (y <= bounds[:,3])
+
+    def locate(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """ row of a sector under each point, -1 for none """
+
+        (cell_x, cell_y, inside) = self.cells(x, y)
+        cell = np.where(inside, cell_y*self.shape[0] + cell_x, 0)
+        start = self.cell_start[cell]
+        count = np.where(inside, self.cell_count[cell], 0)
+
+        found = np.full(x.shape[0], -1, dtype = np.int32)
+        for k in range(self.cell_depth):
+            pending = np.flatnonzero((found < 0) & (count > k))
+            if pending.shape[0] == 0:
+                break
+            rows = self.cell_rows[start[pending] + k]
+            hit = self.contains(rows, x[pending], y[pending])
+            found[pending[hit]] = rows[hit]
+        return found
+
+def move_agents(
+    sectors: SectorMap, x: np.ndarray, y: np.ndarray, sector: np.ndarray, 
+    dx: np.ndarray, dy: np.ndarray, radius: np.ndarray, 
+    step: float = MOVE_STEP) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+        Move many agents at once, each by (dx, dy), stopping at 
+        walls and closed doors axis by axis as Player.move always
+        has, and following them into the sectors they end up in.
+        Moves longer than step are taken in equal steps so nobody 
+        passes through a sector between checks.
+
+        Returns the new x, y and sector rows. Agents in no sector 
+        (-1) stay where they are.
+    """
+
+    x = np.array(x, dtype = np.float64)
+    y = np.array(y, dtype = np.float64)
+    sector = np.array(sector, dtype = np.int32)
+    steps = np.ceil(np.maximum(np.abs(dx), np.abs(dy)) / step).astype(int)
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        step_x = np.where(steps > 0, dx / steps, 0.0)
+        step_y = np.where(steps > 0, dy / steps, 0.0)
+
+    for i in range(int(steps.max(initial = 0))):
+        moving = (steps > i) & (sector >= 0)
+        if moving.all():
+            (x, y, sector) = step_agents(sectors, x, y, sector, step_x, step_y, radius)
+            continue
+        moving = np.flatnonzero(moving)
+        if moving.shape[0] == 0:
+            break
+        (x[moving], y[moving], sector[moving]) = step_agents(
+            sectors, x[moving], y[moving], sector[moving], 
+            step_x[moving], step_y[moving], radius[moving])
+    return x, y, sector
+
+def step_agents(
+    sectors: SectorMap, x: np.ndarray, y: np.ndarray, sector: np.ndarray, 
+    dx: np.ndarray, dy: np.ndarray, 
+    radius: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ one collision checked step of move_agents """
+
+    bounds = sectors.bounds[sector]
+    blocking = sectors.blocking[sector]
+
+    #each axis on its own, from where the agent started
+    hit_x = ((dx < 0) & (x + dx - radius < bounds[:,0]) & (blocking & 1 > 0)) \
+        | ((dx > 0) & (x + dx + radius > bounds[:,2]) & (blocking & 4 > 0))
+    hit_y = ((dy < 0) & (y + dy - radius < bounds[:,1]) & (blocking & 8 > 0)) \
+        | ((dy > 0) & (y + dy + radius > bounds[:,3]) & (blocking & 2 > 0))
+    new_x = np.where(hit_x, x, x + dx)
+    new_y = np.where(hit_y, y, y + dy)
+
+    left = np.flatnonzero(
+        (new_x < bounds[:,0]) | (new_x > bounds[:,2]) 
+        | (new_y < bounds[:,1]) | (new_y > bounds[:,3]))
+    if left.shape[0] == 0:
+        return new_x, new_y, sector
+
+    #edge crossed: west, east, north, then south
+    (out_x, out_y, out_bounds) = (new_x[left], new_y[left], bounds[left])
+    edge = np.select(
+        (out_x < out_bounds[:,0], out_x > out_bounds[:,2], out_y < out_bounds[:,1]),
+        (0, 2, 3), 1)
+    rows = sectors.links[sector[left], edge]
+    linked = rows >= 0
+    linked[linked] = sectors.contains(rows[linked], new_x[left[linked]], new_y[left[linked]])
+    #corners and partly shared edges
+    lost = np.flatnonzero(~linked)
+    rows[lost] = sectors.locate(new_x[left[lost]], new_y[left[lost]])
+
+    #nowhere to go, stay put
+    stuck = left[rows < 0]
+    new_x[stuck] = x[stuck]
+    new_y[stuck] = y[stuck]
+    sector = sector.copy()
+    sector[left] = np.where(rows < 0, sector[left], rows)
+    return new_x, new_y, sector
+#endregion
+################ Ray Casting   ################################################
+#region
+def cast_rays(
+    sectors: SectorMap, x: np.ndarray, y: np.ndarray, sector: np.ndarray, 
+    dx: np.ndarray, dy: np.ndarray, 
+    reach: np.ndarray) -> tuple[np.ndarray, np.ndarray, tuple[np.ndarray, np.ndarray]]:
+    """
+        Cast many rays at once from (x, y) along the unit vectors 
+        (dx, dy), walking the sector graph: out of each sector by 
+        the edge the ray leaves through, stopping at walls, closed 
+        doors, the edge of the level or reach.
+
+        Returns how far each ray got, the sector it stopped in, and 
+        the (ray, sector row) of every sector the rays passed 
+        through, starting sectors included.
+    """
+
+    x = np.asarray(x, dtype = np.float64)
+    y = np.asarray(y, dtype = np.float64)
+    reach = np.asarray(reach, dtype = np.float64)
+    end = np.array(sector, dtype = np.int32)
+    distance = np.zeros(x.shape[0])
+    live = np.flatnonzero(end >= 0)
+    passed = ([live], [end[live]])
+
+    while live.shape[0] > 0:
+        rows = end[live]
+        bounds = sectors.bounds[rows]
+        (ray_x, ray_y, step_x, step_y) = (x[live], y[live], dx[live], dy[live])
+        #how far along the ray it meets the far side, on each axis
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            out_x = np.where(step_x < 0, (bounds[:,0] - ray_x) / step_x, 
+                np.where(step_x > 0, (bounds[:,2] - ray_x) / step_x, np.inf))
+            out_y = np.where(step_y < 0, (bounds[:,1] - ray_y) / step_y, 
+                np.where(step_y > 0, (bounds[:,3] - ray_y) / step_y, np.inf))
+        out = np.minimum(out_x, out_y)
+        edge = np.where(out_x <= out_y, np.where(step_x < 0, 0, 2), np.where(step_y < 0, 3, 1))
+        distance[live] = np.minimum(out, reach[live])
+
+        crossing = (out < reach[live]) & ((sectors.blocking[rows] >> edge.astype(np.uint8)) & 1 == 0)
+        live = live[crossing]
+        if live.shape[0] == 0:
+            break
+        #just over the edge, into whichever sector is there
+        (rows, edge, out) = (rows[crossing], edge[crossing], out[crossing] + RAY_NUDGE)
+        (over_x, over_y) = (x[live] + dx[live]*out, y[live] + dy[live]*out)
+        after = sectors.links[rows, edge]
+        linked = after >= 0
+        linked[linked] = sectors.contains(after[linked], over_x[linked], over_y[linked])
+        lost = np.flatnonzero(~linked)
+        if lost.shape[0] > 0:
+            after[lost] = sectors.locate(over_x[lost], over_y[lost])
+
+        found = after >= 0
+        (live, after) = (live[found], after[found])
+        end[live] = after
+        passed[0].append(live)
+        passed[1].append(after)
+    return distance, end, (np.concatenate(passed[0]), np.concatenate(passed[1]))
+
+def line_of_sight(
+    sectors: SectorMap, x: np.ndarray, y: np.ndarray, sector: np.ndarray,
+    to_x: np.ndarray, to_y: np.ndarray) -> np.ndarray:
+    """ whether nothing blocks the way from each (x, y) to (to_x, to_y) """
+
+    length = np.hypot(to_x - x, to_y - y)
+    scale = np.where(length > 0, 1/np.maximum(length, 1e-9), 0.0)
+    (distance, _, _) = cast_rays(
+        sectors, x, y, sector, (to_x - x)*scale, (to_y - y)*scale, length)
+    return distance >= length - 1e-6
+
+def first_hit(
+    pool: "EntityPool", slots: np.ndarray, x: float, y: float, 
+    dx: float, dy: float, reach: float) -> int:
+    """ slot of the nearest of the entities a ray passes through within reach, -1 for none """
+
+    if slots.shape[0] == 0:
+        return -1
+    (offset_x, offset_y) = (pool.x[slots] - x, pool.y[slots] - y)
+    along = offset_x*dx + offset_y*dy
+    aside = offset_y*dx - offset_x*dy
+    size = pool.size[slots]
+    #where the ray goes into each entity's circle
+    into = along - np.sqrt(np.maximum(size**2 - aside**2, 0))
+    hit = (np.abs(aside) < size) & (along >= 0) & (into <= reach)
+    if not hit.any():
+        return -1
+    hits = np.flatnonzero(hit)
+    return int(slots[hits[np.argmin(into[hits])]])
+#endregion
+################ Navigation    ################################################
+#region
+class NavGraph:
+    """
+        Paths between sectors, in two levels. Within a room, A* over 
+        its sectors. Between rooms, a graph of the gateway sectors 
+        on either side of each room crossing: the crossings 
+        themselves, passable while their door is open, and the 
+        cost between every two gateways of a room, worked out the 
+        first time the room is routed through and kept.
+
+        Costs run between sector centres and are taken to be the 
+        same both ways. Paths within a room never change, routes 
+        between rooms are cached until a door opens or closes. 
+        flow_to shares one search among every agent heading for the 
+        same sector.
+    """
+
+
+    def __init__(self, sectors: SectorMap, level: LevelData):
+
+        self.sectors = sectors
+        self.rooms = level.sector_rooms
+        self.centers = (sectors.low + sectors.high) / 2
+        self.find_edges()
+
+        #python copies for the searches that go a sector at a time
+        self._rooms = self.rooms.tolist()
+        self._centers = self.centers.tolist()
+        self._edge_start = self.edge_start.tolist()
+        self._edge_to = self.edge_to.tolist()
+        self._edge_cost = self.edge_cost.tolist()
+
+        #gateway -> [(edge, sector across)], room -> its gateways
+        self.crossings: dict[int, list[tuple[int, int]]] = {}
+        self.gateways: dict[int, list[int]] = {}
+        for edge in np.flatnonzero(self.rooms[self.edge_from] != self.rooms[self.edge_to]).tolist():
+            row = self._edge_to[edge]
+            gateway = int(self.edge_from[edge])
+            if gateway not in self.crossings:
+                self.crossings[gateway] = []
+                self.gateways.setdefault(self._rooms[gateway], []).append(gateway)
+            self.crossings[gateway].append((edge, row))
+        #room -> gateway -> {gateway: cost}, filled in as rooms are routed through
+        self.room_links: dict[int, dict[int, dict[int, float]]] = {}
+
+        #(start, goal) -> sector rows, least recently used first
+        self.room_paths: dict[tuple[int, int], list[int] | None] = {}
+        self.routes: dict[tuple[int, int], list[int] | None] = {}
+        #goal -> (edge to take from each sector, distance left)
+        self.flows: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        self.door_revision = sectors.door_revision
+        self.stats = {"hits": 0, "misses": 0, "flows": 0}
+
+    def find_edges(self) -> None:
+        """ 
+            every way out of each sector, grouped by sector: the 
+            neighbour, the cost, the door on the way or -1, and the 
+            middle of the shared stretch of edge to aim for 
+        """
+
+        sectors = self.sectors
+        (low, high) = (sectors.low, sectors.high)
+        #sectors that touch share a grid cell
+        pairs = [np.zeros((0, 2), dtype = np.int32)]
+        for i in range(sectors.cell_depth):
+            for j in range(i + 1, sectors.cell_depth):
+                cells = np.flatnonzero(sectors.cell_count > j)
+                start = sectors.cell_start[cells]
+                pairs.append(np.stack(
+                    (sectors.cell_rows[start + i], sectors.cell_rows[start + j]), axis = 1))
+        pairs = np.unique(np.sort(np.concatenate(pairs), axis = 1), axis = 0)
+        a = np.concatenate((pairs[:,0], pairs[:,1]))
+        b = np.concatenate((pairs[:,1], pairs[:,0]))
+
+        overlap_low = np.maximum(low[a], low[b])
+        overlap_high = np.minimum(high[a], high[b])
+        #in EDGES order: west, south, east, north
+        along_y = overlap_high[:,1] - overlap_low[:,1] > 0.01
+        along_x = overlap_high[:,0] - overlap_low[:,0] > 0.01
+        edge = np.select((
+            along_y & (np.abs(low[a,0] - high[b,0]) < 0.01),
+            along_x & (np.abs(high[a,1] - low[b,1]) < 0.01),
+            along_y & (np.abs(high[a,0] - low[b,0]) < 0.01),
+            along_x & (np.abs(low[a,1] - high[b,1]) < 0.01)),
+            (0, 1, 2, 3), -1)
+        keep = edge >= 0
+        keep[keep] = (sectors.walls[a[keep]] >> edge[keep].astype(np.uint8)) & 1 == 0
+        order = np.flatnonzero(keep)
+        order = order[np.argsort(a[order], kind = "stable")]
+        (a, b, edge) = (a[order], b[order], edge[order])
+        (overlap_low, overlap_high) = (overlap_low[order], overlap_high[order])
+
+        self.edge_from = a.astype(np.int32)
+        self.edge_to = b.astype(np.int32)
+        self.edge_start = np.searchsorted(a, np.arange(self.rooms.shape[0] + 1))
+        centers = self.centers
+        self.edge_cost = np.hypot(*(centers[b] - centers[a]).T)
+        self.portals = (overlap_low + overlap_high) / 2
+
+        #edges lying on a door's sector edge
+        door_keys = [
+            (row*4 + side, door) 
+            for door, edges in enumerate(sectors.door_edges) for row, side in edges]
+        self.edge_door = np.full(a.shape[0], -1, dtype = np.int32)
+        if door_keys:
+            (keys, doors) = np.array(sorted(door_keys)).T
+            place = np.minimum(np.searchsorted(keys, a*4 + edge), keys.shape[0] - 1)
+            found = keys[place] == a*4 + edge
+            self.edge_door[found] = doors[place[found]]
+        #edges by the sector they lead to, for searching backwards
+        self.edges_in = np.argsort(b, kind = "stable")
+        self.edge_in_start = np.searchsorted(b[self.edges_in], np.arange(self.rooms.shape[0] + 1))
+
+    def passable(self, edges: np.ndarray) -> np.ndarray:
+        """ whether each edge is free of closed doors """
+
+        door = self.edge_door[edges]
+        closed = self.sectors.door_closed
+        if closed.shape[0] == 0:
+            return door < 0
+        return (door < 0) | ~closed[np.maximum(door, 0)]
+
+    def check_doors(self) -> None:
+        """ forget everything that went through doors if one has changed """
+
+        if self.door_revision != self.sectors.door_revision:
+            self.door_revision = self.sectors.door_revision
+            self.routes.clear()
+            self.flows.clear()
+
+    def search_room(self, start: int, goal: int = -1) -> tuple[dict[int, float], dict[int, int]]:
+        """ 
+            A* from start to goal over the sectors of start's room, 
+            or Dijkstra over the whole room without a goal. Returns 
+            the cost to each sector reached and where it was reached from.
+        """
+
+        room = self._rooms[start]
+        (rooms, centers) = (self._rooms, self._centers)
+        (edge_start, edge_to, edge_cost) = (self._edge_start, self._edge_to, self._edge_cost)
+        if goal >= 0:
+            (goal_x, goal_y) = centers[goal]
+
+        cost = {start: 0.0}
+        parent = {start: -1}
+        frontier = [(0.0, 0.0, start)]
+        done = set()
+        while frontier:
+            (_, g, row) = heapq.heappop(frontier)
+            if row == goal:
+                break
+            if row in done:
+                continue
+            done.add(row)
+            for edge in range(edge_start[row], edge_start[row + 1]):
+                other = edge_to[edge]
+                if rooms[other] != room:
+                    continue
+                g_other = g + edge_cost[edge]
+                if g_other < cost.get(other, math.inf):
+                    cost[other] = g_other
+                    parent[other] = row
+                    h = 0.0
+                    if goal >= 0:
+                        (x, y) = centers[other]
+                        h = math.hypot(goal_x - x, goal_y - y)
+                    heapq.heappush(frontier, (g_other + h, g_other, other))
+        return cost, parent
+
+    def room_path(self, start: int, goal: int) -> list[int] | None:
+        """ sectors from start to goal without leaving the room, None if there's no way """
+
+        key = (start, goal)
+        if key in self.room_paths:
+            self.stats["hits"] += 1
+            path = self.room_paths.pop(key)
+        else:
+            self.stats["misses"] += 1
+            path = None
+            if self._rooms[start] == self._rooms[goal]:
+                (_, parent) = self.search_room(start, goal)
+                if goal in parent:
+                    path = unwind(parent, goal)
+            if len(self.room_paths) >= NAV_PATH_CACHE:
+                del self.room_paths[next(iter(self.room_paths))]
+        self.room_paths[key] = path
+        return path
+
+    def room_gateways(self, room: int) -> dict[int, dict[int, float]]:
+        """ cost between every two gateways of the room """
+
+        links = self.room_links.get(room)
+        if links is None:
+            links = {}
+            gateways = self.gateways.get(room, [])
+            for gateway in gateways:
+                (cost, _) = self.search_room(gateway)
+                links[gateway] = {other: cost[other] for other in gateways if other in cost}
+            self.room_links[room] = links
+        return links
+
+    def path(self, start: int, goal: int) -> list[int] | None:
+        """ sectors from start to goal, through open doors, None if there's no way """
+
+        self.check_doors()
+        if self._rooms[start] == self._rooms[goal]:
+            path = self.room_path(start, goal)
+            if path is not None:
+                return path
+
+        key = (start, goal)
+        if key in self.routes:
+            self.stats["hits"] += 1
+            path = self.routes.pop(key)
+        else:
+            self.stats["misses"] += 1
+            path = self.route(start, goal)
+            if len(self.routes) >= NAV_PATH_CACHE:
+                del self.routes[next(iter(self.routes))]
+        self.routes[key] = path
+        return path
+
+    def route(self, start: int, goal: int) -> list[int] | None:
+        """ 
+            A* over the gateways from start to goal, then each 
+            stretch within a room filled in sector by sector 
+        """
+
+        rooms = self._rooms
+        goal_room = rooms[goal]
+        (from_start, _) = self.search_room(start)
+        (to_goal, _) = self.search_room(goal)
+        (goal_x, goal_y) = self._centers[goal]
+
+        def links(row: int) -> list[tuple[int, float]]:
+            room = rooms[row]
+            if row == start:
+                within = {
+                    gateway: from_start[gateway] 
+                    for gateway in self.gateways.get(room, []) if gateway in from_start}
+            else:
+                within = self.room_gateways(room).get(row, {})
+            found = list(within.items())
+            if room == goal_room and row in to_goal:
+                found.append((goal, to_goal[row]))
+            crossings = self.crossings.get(row, [])
+            if crossings:
+                edges = np.array([edge for edge, _ in crossings])
+                for (edge, other), ok in zip(crossings, self.passable(edges).tolist()):
+                    if ok:
+                        found.append((other, self._edge_cost[edge]))
+            return found
+
+        cost = {start: 0.0}
+        parent = {start: -1}
+        frontier = [(0.0, 0.0, start)]
+        done = set()
+        while frontier:
+            (_, g, row) = heapq.heappop(frontier)
+            if row == goal:
+                break
+            if row in done:
+                continue
+            done.add(row)
+            for other, step in links(row):
+                g_other = g + step
+                if g_other < cost.get(other, math.inf):
+                    cost[other] = g_other
+                    parent[other] = row
+                    (x, y) = self._centers[other]
+                    heapq.heappush(frontier, (g_other + math.hypot(goal_x - x, goal_y - y), g_other, other))
+        if goal not in parent:
+            return None
+
+        waypoints = unwind(parent, goal)
+        path = [start]
+        for row_a, row_b in zip(waypoints, waypoints[1:]):
+            if rooms[row_a] != rooms[row_b]:
+                path.append(row_b)
+                continue
+            stretch = self.room_path(row_a, row_b)
+            if stretch is None:
+                return None
+            path.extend(stretch[1:])
+        return path
+
+    def flow_to(self, goal: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+            For every sector, the edge to take towards goal, -1 where 
+            there's no way or at the goal, and the distance left. 
+            Searched backwards from the goal a wave of sectors at a 
+            time, so any number of agents can be steered by looking 
+            up their sectors.
+        """
+
+        self.check_doors()
+        flow = self.flows.pop(goal, None)
+        if flow is None:
+            self.stats["flows"] += 1
+            flow = self.search_flow(goal)
+            if len(self.flows) >= NAV_FLOW_CACHE:
+                del self.flows[next(iter(self.flows))]
+        self.flows[goal] = flow
+        return flow
+
+    def search_flow(self, goal: int) -> tuple[np.ndarray, np.ndarray]:
+
+        distance = np.full(self.rooms.shape[0], np.inf)
+        via = np.full(self.rooms.shape[0], -1, dtype = np.int32)
+        distance[goal] = 0.0
+        wave = np.array([goal])
+        while wave.shape[0] > 0:
+            #edges into the sectors that just got nearer
+            counts = self.edge_in_start[wave + 1] - self.edge_in_start[wave]
+            (run, k) = runs(counts)
+            edges = self.edges_in[self.edge_in_start[wave][run] + k]
+            edges = edges[self.passable(edges)]
+            rows = self.edge_from[edges]
+            reach = distance[self.edge_to[edges]] + self.edge_cost[edges]
+            better = reach < distance[rows] - 1e-9
+            (edges, rows, reach) = (edges[better], rows[better], reach[better])
+            #the nearest way for sectors reached more than once
+            order = np.lexsort((reach, rows))
+            first = np.ones(order.shape[0], dtype = np.bool_)
+            first[1:] = rows[order][1:] != rows[order][:-1]
+            order = order[first]
+            distance[rows[order]] = reach[order]
+            via[rows[order]] = edges[order]
+            wave = rows[order]
+        return via, distance
+
+def unwind(parent: dict[int, int], row: int) -> list[int]:
+    """ the chain of parents ending at row, first first """
+
+    path = []
+    while row >= 0:
+        path.append(row)
+        row = parent[row]
+    path.reverse()
+    return path
 #endregion
 ################ Model   ######################################################
 #region
 
+class EntityPool:
+    """
+        Struct of arrays holding every entity of one kind. Slots are 
+        reused once released, so a slot number is only meaningful 
+        while it's alive.
+    """
+
+
+    def __init__(self, capacity: int = ENTITY_POOL_CAPACITY):
+
+        capacity = max(1, capacity)
+        self.x = np.zeros(capacity, dtype = np.float64)
+        self.y = np.zeros(capacity, dtype = np.float64)
+        self.z = np.zeros(capacity, dtype = np.float64)
+        self.height = np.zeros(capacity, dtype = np.float64)
+        self.size = np.zeros(capacity, dtype = np.float64)
+        #row of the owning sector in the level data, -1 for none
+        self.sector = np.full(capacity, -1, dtype = np.int32)
+        self.alive = np.zeros(capacity, dtype = np.bool_)
+        #AI: what it's doing, which way it's going (radians) 
+        # and the scene frame it last thought, -1 for never
+        self.state = np.zeros(capacity, dtype = np.uint8)
+        self.heading = np.zeros(capacity, dtype = np.float64)
+        self.thought = np.full(capacity, -1, dtype = np.int64)
+
+        #slots in use are all below count
+        self.count = 0
+        self.free: list[int] = []
+        #bumped whenever an entity is added, removed or moved
+        self.revision = 0
+    
+    def capacity(self) -> int:
+
+        return self.x.shape[0]
+    
+    def grow(self, capacity: int) -> None:
+
+        for name in (
+            "x", "y", "z", "height", "size", "sector", "alive", 
+            "state", "heading", "thought"):
+            old = getattr(self, name)
+            new = np.full(capacity, -1 if name in ("sector", "thought") else 0, dtype = old.dtype)
+            new[:old.shape[0]] = old
+            setattr(self, name, new)
+    
+    def allocate(self, 
+        x: float, y: float, z: float, height: float, size: float, 
+        sector: int = -1) -> int:
+
+        if self.free:
+            slot = self.free.pop()
+        else:
+            if self.count == self.capacity():
+                self.grow(2 * self.capacity())
+            slot = self.count
+            self.count += 1
+        
+        self.x[slot] = x
+        self.y[slot] = y
+        self.z[slot] = z
+        self.height[slot] = height
+        self.size[slot] = size
+        self.sector[slot] = sector
+        self.alive[slot] = True
+        self.state[slot] = DRAKE_WANDER
+        self.thought[slot] = -1
+        self.revision += 1
+        return slot
+    
+    def release(self, slots: int | np.ndarray) -> None:
+
+        slots = np.atleast_1d(slots)
+        slots = slots[self.alive[slots]]
+        if slots.shape[0] == 0:
+            return
+        self.alive[slots] = False
+        self.sector[slots] = -1
+        self.free.extend(slots.tolist())
+        self.revision += 1
+    
+    def move(self, slot: int, x: float, y: float) -> None:
+
+        self.x[slot] = x
+        self.y[slot] = y
+        self.revision += 1
+    
+    def place(self, 
+        slots: np.ndarray, x: np.ndarray, y: np.ndarray, sector: np.ndarray) -> None:
+        """ move many entities at once, eg. after move_agents """
+
+        self.x[slots] = x
+        self.y[slots] = y
+        self.sector[slots] = sector
+        self.revision += 1
+    
+    def live_slots(self) -> np.ndarray:
+
+        return np.flatnonzero(self.alive[:self.count])
+    
+    def in_sectors(self, rows) -> np.ndarray:
+        """ live slots owned by any of the given sector rows, in slot order """
+
+        owners = self.sector[:self.count]
+        #a flag per row, with a spare false one at the end for -1
+        rows = np.asarray(rows, dtype = np.int64)
+        member = np.zeros(int(owners.max(initial = -1)) + 2, dtype = np.bool_)
+        member[rows[(rows >= 0) & (rows < member.shape[0] - 1)]] = True
+        return np.flatnonzero(self.alive[:self.count] & member[owners])
+    
+    def in_sector(self, row: int) -> np.ndarray:
+
+        return np.flatnonzero(self.alive[:self.count] & (self.sector[:self.count] == row))
+    
+    def records(self, slots: np.ndarray) -> list[tuple]:
+        """ (x, y, z, height, size) of each slot """
+
+        return list(zip(
+            self.x[slots].tolist(), self.y[slots].tolist(), self.z[slots].tolist(),
+            self.height[slots].tolist(), self.size[slots].tolist()))
+    
+    def views(self, slots: np.ndarray) -> list["Entity"]:
+
+        return [Entity.view(self, slot) for slot in slots.tolist()]
+
 class Entity:
+    """
+        A handle on one slot of an entity pool. Two handles on the 
+        same slot are equal, so fresh ones can be made whenever needed.
+    """
+
+    __slots__ = ("pool", "slot")
+
+
+    def __init__(self, 
+        x: float, y: float, z: float, height: float, size: float, 
+        pool: EntityPool = None, sector: int = -1):
+
+        if pool is None:
+            pool = EntityPool(1)
+        self.pool = pool
+        self.slot = pool.allocate(x, y, z, height, size, sector)
+    
+    @classmethod
+    def view(cls, pool: EntityPool, slot: int) -> "Entity":
 
+        entity = cls.__new__(cls)
+        entity.pool = pool
+        entity.slot = slot
+        return entity
+    
+    def __eq__(self, other: object) -> bool:
 
-    def __init__(self, x: float, y: float, z: float, height: float, size: float):
+        return (isinstance(other, Entity) 
+            and self.pool is other.pool and self.slot == other.slot)
+    
+    def __hash__(self) -> int:
 
-        self._position = (x, y)
-        self._z = z
-        self._height = height
-        self._size = size
+        return hash((id(self.pool), self.slot))
 
     def get_position(self) -> vec2:
 
-        return self._position
+        return (float(self.pool.x[self.slot]), float(self.pool.y[self.slot]))
     
     def set_position(self, new_position: vec2) -> None:
 
-        self._position = new_position
+        self.pool.move(self.slot, new_position[0], new_position[1])
     
     def get_top(self) -> float:
 
-        return self._z + self._height
-    
-    def get_bottom(self) -> float:
-
-        return self._z
+        return float(self.pool.z[self.slot] + self.pool.height[self.slot])
     
     def get_size(self) -> float:
 
-        return self._size
+        return float(self.pool.size[self.slot])
 
 class Player(Entity):
 
@@ -256,43 +1988,50 @@ class Player(Entity):
         self.speed = 2
         self.energy = 0
         self.sector: Sector = None
+        self.spatial_index: SpatialGrid = None
+        self.sector_map: SectorMap = None
 
     def setRoom(self,newRoom):
         self.room = newRoom
+        self.room.load()
         self.recalculateSector()
 
     def recalculateSector(self):
+        if self.spatial_index is not None:
+            s = self.spatial_index.sector_at(self.get_position(), self.room)
+            if s is not None:
+                self.sector = s
+            return
+
         for s in self.room.getSectors():
-            if s.inSector(self._position):
+            if s.inSector(self.get_position()):
                 self.sector = s
                 break
 
     def move(self,dx,dy):
-        #check movement in x and y direction separately
-        temp = [0,0]
-
-        check = (dx,0)
-        could_move_to = translate(self._position,check)
-        if not self.sector.hitWall(could_move_to,self._size,check):
-            temp[0] = dx
-
-        check = (0,dy)
-        could_move_to = translate(self._position,check)
-        if not self.sector.hitWall(could_move_to,self._size,check):
-            temp[1] = dy
-
-        self._position = translate(self._position,temp)
-        self.sector = self.sector.newSector(self._position)
-        if self.sector is None:
-            #may have crossed a door!
-            #select nearest door
-            for d in self.room.doors:
-                if quick_distance(self._position,d.mid)<=32:
-                    self.setRoom(d.getRoom(self._position))
-                    break
+        #one agent through the same step as everything else that moves
+        (x, y), size = self.get_position(), self.get_size()
+        x, y, rows = move_agents(
+            self.sector_map, np.array([x]), np.array([y]), 
+            np.array([self.sector.index]), np.array([dx]), np.array([dy]), 
+            np.array([size]))
+        position = (float(x[0]), float(y[0]))
+        self.set_position(position)
+
+        row = int(rows[0])
+        if row == self.sector.index:
+            return
+        for sector in self.spatial_index.sectors_at(position):
+            if sector.index == row:
+                if sector.room is not self.room:
+                    #through a door
+                    self.setRoom(sector.room)
+                self.sector = sector
+                break
 
 class Wall:
 
+    next_key = 0
 
     def __init__(self, pos_a: vec2, pos_b: vec2, backface_visible:bool = False):
         
@@ -302,6 +2041,10 @@ class Wall:
         self.z = 0
         self.height = 80
         self.tag = "wall"
+        self.sector: Sector = None
+        #names the wall in display lists
+        self.key = Wall.next_key
+        Wall.next_key += 1
 
         #calculate normal
         dx = self.pos_b[0]-self.pos_a[0]
@@ -330,50 +2073,35 @@ class Door(Wall):
         self.room_rd.addDoor(self)
         self.is_open = False
         self.mid = scale(translate(self.pos_a,self.pos_b),0.5)
-
-    def getRoom(self, pos: vec2) -> "Room":
-
-        if self.normal[0]==0:
-            #horizontal door
-            if pos[1] < self.pos_a[1]:
-                return self.room_lu
-            else:
-                return self.room_rd
-        else:
-            #vertical door
-            if pos[0] < self.pos_a[0]:
-                return self.room_lu
-            else:
-                return self.room_rd
+        #position in the level file
+        self.index = 0
+        #sectors whose edge the door sits on
+        self.sectors: list[Sector] = []
 
     def open(self) -> None:
-        self.room_lu.activate()
-        self.room_rd.activate()
+        """ open, holding both rooms active """
+
         self.is_open = True
+        self.room_lu.hold()
+        self.room_rd.hold()
 
-    def close(self, player_position: vec2) -> None:
+    def close(self) -> None:
 
         self.is_open = False
-        if self.normal[0]==0:
-            #horizontal door
-            if player_position[1] < self.pos_a[1]:
-                self.room_rd.deactivate()
-            else:
-                self.room_lu.deactivate()
-        else:
-            #vertical door
-            if player_position[0] < self.pos_a[0]:
-                self.room_rd.deactivate()
-            else:
-                self.room_lu.deactivate()
-
-    def update(self, player_position: vec2) -> None:
-
-        if quick_distance(self.mid, player_position) <= 32:
-            if not self.is_open:
-                self.open()
-        elif self.is_open:
-            self.close(player_position)
+        self.room_lu.release()
+        self.room_rd.release()
+
+    def update(self, player_position: vec2) -> bool:
+        """ open or close the door, returns whether it changed """
+
+        distance = quick_distance(self.mid, player_position)
+        if not self.is_open and distance <= DOOR_OPEN_DISTANCE:
+            self.open()
+            return True
+        if self.is_open and distance > DOOR_CLOSE_DISTANCE:
+            self.close()
+            return True
+        return False
 
 class Sector:
 
@@ -393,11 +2121,17 @@ class Sector:
 
         #meta-data
         self.walls: list[Wall] = []
-        self.drake_nanas: list[Entity] = []
+        #pool holding the drakes, owned by the scene
+        self.entity_pool: EntityPool = None
+        self.room: Room = None
+        #row in the level data
+        self.index = 0
         self.connects_ab = None
         self.connects_bc = None
         self.connects_cd = None
         self.connects_da = None
+        #edge name -> door on that edge
+        self.doors: dict[str, Door] = {}
         #construct walls
         if sides[0]:
             #north
@@ -411,16 +2145,24 @@ class Sector:
         if sides[3]:
             #west
             self.walls.append(Wall(self.pos_a,self.pos_b))
-        
-        self.spawn_drake_nanas()
+        for wall in self.walls:
+            wall.sector = self
     
-    def spawn_drake_nanas(self) -> None:
+    def spawn_drake_nanas(self, pool: EntityPool) -> None:
 
+        self.entity_pool = pool
         if random.uniform(a=0.0, b=1.0) < SPAWN_RATE:
             x = self.pos_a[0] + random.uniform(a=0.0, b=self.size[0])
             y = self.pos_a[1] + random.uniform(a=0.0, b=self.size[1])
-            self.drake_nanas.append(
-                Entity(x=x, y=y, z=0, height = 40, size=12))
+            pool.allocate(x=x, y=y, z=0, height = 40, size=12, sector = self.index)
+    
+    @property
+    def drake_nanas(self) -> list[Entity]:
+        """ handles on the drakes in this sector, slow: prefer querying the pool """
+
+        if self.entity_pool is None:
+            return []
+        return self.entity_pool.views(self.entity_pool.in_sector(self.index))
 
     def getCorners(self) -> tuple[vec2]:
 
@@ -431,6 +2173,43 @@ class Sector:
                     self.pos_d
                 )
 
+    def getEdges(self) -> dict[str, line_segment]:
+
+        return {
+            "ab": (self.pos_a, self.pos_b),
+            "bc": (self.pos_b, self.pos_c),
+            "cd": (self.pos_c, self.pos_d),
+            "da": (self.pos_d, self.pos_a),
+        }
+
+    def getNeighbour(self, edge: str) -> "Sector":
+
+        return getattr(self, "connects_" + edge)
+
+    def hasWall(self, edge: str) -> bool:
+
+        return bool(self.sides[EDGE_SIDES[edge]])
+
+    def edge_at(self, pos_a: vec2, pos_b: vec2) -> str | None:
+        """ name of the edge the segment lies on, if any """
+
+        for name, (corner_a, corner_b) in self.getEdges().items():
+            low_x = min(corner_a[0], corner_b[0]) - 0.01
+            high_x = max(corner_a[0], corner_b[0]) + 0.01
+            low_y = min(corner_a[1], corner_b[1]) - 0.01
+            high_y = max(corner_a[1], corner_b[1]) + 0.01
+            if near(corner_a[0], corner_b[0]):
+                #vertical edge
+                on_edge = near(pos_a[0], corner_a[0]) and near(pos_b[0], corner_a[0])
+            else:
+                #horizontal edge
+                on_edge = near(pos_a[1], corner_a[1]) and near(pos_b[1], corner_a[1])
+            if on_edge \
+                and low_x <= pos_a[0] <= high_x and low_x <= pos_b[0] <= high_x \
+                and low_y <= pos_a[1] <= high_y and low_y <= pos_b[1] <= high_y:
+                return name
+        return None
+
     def inSector(self, pos: vec2) -> bool:
 
         if pos[0] < self.pos_a[0]:
@@ -443,57 +2222,6 @@ class Sector:
             return False
         return True
     
-    def newSector(self, pos: vec2) -> "Sector":
-
-        #west
-        if pos[0] < self.pos_a[0]:
-            return self.connects_ab
-        #east
-        if pos[0] > self.pos_c[0]:
-            return self.connects_cd
-        #north
-        if pos[1] < self.pos_a[1]:
-            return self.connects_da
-        #south
-        if pos[1] > self.pos_c[1]:
-            return self.connects_bc
-        return self
-    
-    def hitWall(self, pos: vec2, size: vec2, velocity: vec2) -> bool:
-
-        (vx,vy) = velocity
-        if vx<0:
-            #west
-            west = pos[0] - size
-            if west < self.pos_a[0] and self.sides[3]:
-                return True
-        elif vx>0:
-            #east
-            east = pos[0] + size
-            if east > self.pos_c[0] and self.sides[1]:
-                return True
-        
-        if vy<0:
-            #north
-            north = pos[1] - size
-            if north < self.pos_a[1] and self.sides[0]:
-                return True
-        elif vy>0:
-            #south
-            south = pos[1] + size
-            if south > self.pos_c[1] and self.sides[2]:
-                return True
-        return False
-
-    def is_connected(self) -> bool:
-
-        return not(
-            (self.connects_ab is None and not self.sides[0]) \
-            or (self.connects_bc is None and not self.sides[1]) \
-            or (self.connects_cd is None and not self.sides[2]) \
-            or (self.connects_da is None and not self.sides[3])
-        )
-
 class Room:
 
 
@@ -503,180 +2231,356 @@ class Room:
         self.tag = ""
         self.doors: list[Door] = []
         self.active = False
+        #position in the level file
+        self.index = 0
+        #active while anything holds it: the player being inside, 
+        # each open door onto it
+        self.holds = 0
+        self._wall_table: WallTable = None
+
+        #streaming: rows of the room's sectors in the level data,
+        # the callback that builds them, and where drakes were 
+        # left when the room was last unloaded
+        self.sector_rows: list[int] = []
+        self.loader: Callable[["Room"], None] = None
+        self.loaded = False
+        #bumped whenever the sectors are built or dropped
+        self.generation = 0
+        self.saved_drakes: dict[int, list[tuple]] = {}
 
     def addSector(self, sector: Sector) -> None:
 
-        if sector not in self.sectors:
+        if sector.room is not self:
             self.sectors.append(sector)
+            sector.room = self
 
     def addDoor(self, door: Door) -> None:
 
         if door not in self.doors:
             self.doors.append(door)
 
+    def load(self) -> None:
+
+        if not self.loaded and self.loader is not None:
+            self.loader(self)
+
     def activate(self) -> None:
         
+        self.load()
         self.active = True
 
     def deactivate(self) -> None:
         
         self.active = False
 
+    def hold(self) -> None:
+
+        self.holds += 1
+        if self.holds == 1:
+            self.activate()
+
+    def release(self) -> None:
+
+        self.holds -= 1
+        if self.holds == 0:
+            self.deactivate()
+
     def getSectors(self) -> list[Sector]:
 
         return self.sectors
 
-    def update(self, player_position: vec2) -> None:
+    def getWallTable(self) -> WallTable:
+        """ walls of every sector followed by the doors, packed once """
 
-        for door in self.doors:
-            door.update(player_position)
+        if self._wall_table is None:
+            walls = [wall for sector in self.sectors for wall in sector.walls]
+            self._wall_table = WallTable(walls + self.doors)
+        return self._wall_table
 
-class Scene:
+class SpatialGrid:
+    """
+        Uniform grid over the level. Loaded sectors are found 
+        through the sector map's grid of rows, doors are filed 
+        under the cell of their midpoint.
+    """
 
-    def __init__(self, filename: str):
 
-        self.rooms: list[Room] = []
-        self.active_rooms: list[Room] = []
-        self.sectors: list[Sector] = []
-        self.unconnected_sectors: list[Sector] = []
-        
-        self.import_data(filename)
+    def __init__(self, 
+        sector_map: SectorMap, sectors: dict[int, Sector], 
+        cell_size: float = GRID_CELL_SIZE):
 
-        self.unconnected_sectors = []
-    
-    def import_data(self, filename):
+        self.cell_size = cell_size
+        self.sector_map = sector_map
+        #the scene's loaded sectors by row, shared not copied
+        self.sectors = sectors
+        self.doors: dict[ivec2, list[Door]] = {}
 
-        with open(filename,'r') as f:
-            line:str = f.readline()
-            while line:
-                tag,_,rest = line.partition("(")
-                parameters,_,_ = rest.partition(")")
-                parameters = parameters.split(",")
+    def cell(self, pos: vec2) -> ivec2:
 
-                match tag[0]:
-                    case "r":
-                        self.add_room(tag)
-                    case 's':
-                        self.add_sector(tag, parameters)
-                    case 'd':
-                        self.add_door(tag, parameters)
-                    case 'p':
-                        self.add_player(tag, parameters)
-                
-                line = f.readline()
+        return (
+            math.floor(pos[0] / self.cell_size), 
+            math.floor(pos[1] / self.cell_size)
+        )
+
+    def cells(self, low: vec2, high: vec2) -> list[ivec2]:
+        """ every cell overlapping the box, edges included """
+
+        (x_a, y_a) = self.cell(low)
+        (x_b, y_b) = self.cell(high)
+        return [(x, y) for x in range(x_a, x_b + 1) for y in range(y_a, y_b + 1)]
+
+    def add_door(self, door: Door) -> None:
+
+        self.doors.setdefault(self.cell(door.mid), []).append(door)
+
+    def loaded_at(self, pos: vec2) -> list[Sector]:
+        """ the loaded sectors filed under the point's cell """
+
+        sectors = self.sectors
+        return [sectors[row] for row in self.sector_map.rows_at(pos).tolist() if row in sectors]
+
+    def sectors_at(self, pos: vec2) -> list[Sector]:
+        """ every loaded sector containing the point, edges included """
+
+        return [s for s in self.loaded_at(pos) if s.inSector(pos)]
+
+    def sector_at(self, pos: vec2, room: "Room" = None) -> Sector | None:
+
+        for s in self.loaded_at(pos):
+            if (room is None or s.room is room) and s.inSector(pos):
+                return s
+        return None
+
+    def doors_near(self, pos: vec2, radius: float) -> list[Door]:
+        """ doors whose midpoint is within Manhattan distance radius """
+
+        low = (pos[0] - radius, pos[1] - radius)
+        high = (pos[0] + radius, pos[1] + radius)
+        doors = []
+        for cell in self.cells(low, high):
+            for door in self.doors.get(cell, ()):
+                if quick_distance(door.mid, pos) <= radius:
+                    doors.append(door)
+        return doors
+
+class Scene:
+
+    def __init__(self, 
+        filename: str, use_cache: bool = True, 
+        sector_budget: int = SECTOR_BUDGET, ai_budget: float = AI_BUDGET):
+
+        self.rooms: list[Room] = []
+        self.active_rooms: list[Room] = []
+        #loaded sectors, by row in the level data
+        self.sectors: dict[int, Sector] = {}
+        self.doors: list[Door] = []
+        self.room_tags: dict[str, Room] = {}
+
+        #set whenever something visible changes, cleared by whoever redraws.
+        # Drakes wandering in sight only set wandered: worth drawing, 
+        # but not worth keeping an idle game awake for
+        self.dirty = True
+        self.wandered = False
+        self._last_pose = None
+
+        #room streaming: loaded rooms, least recently active first
+        self.sector_budget = sector_budget
+        self.loaded_rooms: dict[Room, int] = {}
+        self.frame = 0
+        
+        self.level = load_level(filename, use_cache)
+        self.sector_map = SectorMap(self.level)
+        self.navigation = NavGraph(self.sector_map, self.level)
+        self.spatial_index = SpatialGrid(self.sector_map, self.sectors)
+        self.open_doors: set[Door] = set()
+        #doors that might open or close while the player is in the 
+        # sector they were gathered for, and where they were last checked
+        self.watched_doors: list[Door] = []
+        self._watched_sector: Sector = None
+        self._door_check: vec2 = None
+        #called with the rooms that became active and inactive, 
+        # whenever some do
+        self.room_listeners: list[Callable[[list[Room], list[Room]], None]] = []
+        self.room_stats = {"doors checked": 0, "rooms changed": 0}
+        self.drakes = EntityPool()
+        self._drake_revision = -1
+        #drake AI: ms allowed a tick, drakes that thought last tick, 
+        # the slots the turns of the near ones and the rest carry on 
+        # from and ms a drake took in the last batch
+        self.ai_budget = ai_budget
+        self.ai_stats = {"thought": 0, "waiting": 0}
+        self.ai_near_cursor = 0
+        self.ai_cursor = 0
+        self.ai_rate = 0.0
+        #(near, rest) slots, and the frame and pool size they were found at
+        self._ai_queues: tuple[np.ndarray, np.ndarray] = None
+        self._ai_key = None
+        self.rng = np.random.default_rng(random.getrandbits(32))
+        self.import_data(self.level)
+    
+    def import_data(self, level: LevelData):
+        """ 
+            Rooms and doors are built straight away, sectors only 
+            once their room is needed.
+        """
+
+        for tag in level.room_tags:
+            self.add_room(tag)
+        for sector, room in enumerate(level.sector_rooms.tolist()):
+            self.rooms[room].sector_rows.append(sector)
+
+        points = level.door_points.tolist()
+        door_rooms = level.door_rooms.tolist()
+        for tag, (x_a, y_a, x_b, y_b), (room_lu, room_rd) in zip(
+            level.door_tags, points, door_rooms):
+            self.add_door(tag, (x_a, y_a), (x_b, y_b), self.rooms[room_lu], self.rooms[room_rd])
+
+        (x, y, direction, room) = level.player.tolist()
+        self.add_player(x, y, direction, self.rooms[int(room)])
     
     def add_room(self, tag: str):
 
-        #room
-        # r()
         r = Room()
+        r.index = len(self.rooms)
         self.rooms.append(r)
         r.tag = tag
+        r.loader = self.load_room
+        self.room_tags[tag] = r
     
-    def add_sector(self, tag: str, parameters: list[str]):
-        
-        #sector
-        # s(x,y,width,height,n,e,s,w,room)
-        x      = 32*float(parameters[0])
-        y      = 32*(50-float(parameters[1]))
-        width  = 32*float(parameters[2])
-        height = 32*float(parameters[3])
-        n      = int(parameters[4])
-        e      = int(parameters[5])
-        s      = int(parameters[6])
-        w      = int(parameters[7])
-        room   = parameters[8]
-        pos    = (x, y)
-        size   = (width, height)
-        sides  = (n,e,s,w)
+    def add_sector(self, 
+        index: int, tag: str, pos: vec2, size: vec2, 
+        sides: tuple[int], room: Room, spawn: bool = True):
 
         sector = Sector(pos,size,sides)
-        self.find_room(room).addSector(sector)
+        room.addSector(sector)
         sector.tag = tag
-        self.sectors.append(sector)
-        self.unconnected_sectors.append(sector)
-        self.connect_sector(sector)
+        sector.index = index
+        sector.entity_pool = self.drakes
+        self.sectors[index] = sector
+        if spawn:
+            sector.spawn_drake_nanas(self.drakes)
     
-    def add_door(self, tag: str, parameters: list[str]):
-
-        #door
-        # s(x_a,y_a,x_b,y_b,room_lu,room_rd)
-        x_a     = 32*float(parameters[0])
-        y_a     = 32*(50-float(parameters[1]))
-        x_b     = 32*float(parameters[2])
-        y_b     = 32*(50-float(parameters[3]))
-        room_lu = self.find_room(parameters[4])
-        room_rd = self.find_room(parameters[5])
-        pos_a = (x_a, y_a)
-        pos_b = (x_b, y_b)
+    def add_door(self, 
+        tag: str, pos_a: vec2, pos_b: vec2, room_lu: Room, room_rd: Room):
         
         d = Door(pos_a,pos_b,room_lu,room_rd)
         d.tag = tag
+        d.index = len(self.doors)
+        self.doors.append(d)
+        self.spatial_index.add_door(d)
     
-    def add_player(self, tag: str, parameters: list[str]):
+    def link_doors(self, room: Room) -> None:
+        """ record which of the room's sector edges its doors sit on """
 
-        #player
-        # p(x,y,direction,room)
-        x         = 32*float(parameters[0])
-        y         = 32*(50-float(parameters[1]))
-        direction = float(parameters[2])
-        room      = self.find_room(parameters[3])
+        for door in room.doors:
+            for sector in self.spatial_index.sectors_at(door.mid):
+                if sector.room is not room:
+                    continue
+                edge = sector.edge_at(door.pos_a, door.pos_b)
+                if edge is not None:
+                    sector.doors[edge] = door
+                    door.sectors.append(sector)
+    
+    def add_player(self, x: float, y: float, direction: float, room: Room):
 
         self.player = Player(x, y, direction)
+        self.player.spatial_index = self.spatial_index
+        self.player.sector_map = self.sector_map
         self.player.room = room
-        self.player.room.activate()
+        self.player_room = room
+        room.hold()
         self.player.recalculateSector()
     
-    def connect_sector(self, sector: Sector):
+    def connect_sectors(self, sectors: list[Sector]) -> None:
+        """ 
+            point newly loaded sectors at their loaded neighbours, 
+            and those back at them 
+        """
+
+        links = self.level.sector_links
+        for sector in sectors:
+            for edge, neighbour in zip(EDGES, links[sector.index].tolist()):
+                other = self.sectors.get(neighbour)
+                if other is None:
+                    continue
+                setattr(sector, "connects_" + edge, other)
+                for other_edge, back in zip(EDGES, links[neighbour].tolist()):
+                    if back == sector.index:
+                        setattr(other, "connects_" + other_edge, sector)
+
+    def load_room(self, room: Room) -> None:
+        """ build the room's sectors from the level data """
+
+        level = self.level
+        rects = level.sector_rects[room.sector_rows].tolist()
+        sides = level.sector_sides[room.sector_rows].tolist()
+        for index, (x, y, width, height), sector_sides in zip(
+            room.sector_rows, rects, sides):
+            saved = room.saved_drakes.get(index)
+            self.add_sector(
+                index, level.sector_tags[index], (x, y), (width, height), 
+                tuple(sector_sides), room, spawn = saved is None)
+            for (x, y, z, height, size) in saved or ():
+                self.drakes.allocate(x, y, z, height, size, index)
+        room.saved_drakes = {}
+
+        self.connect_sectors(room.sectors)
+        self.link_doors(room)
+        room.loaded = True
+        room.generation += 1
+        self.loaded_rooms[room] = self.frame
+
+    def unload_room(self, room: Room) -> None:
+        """ drop the room's sectors, keeping where its drakes were """
+
+        drakes = self.drakes
+        slots = drakes.in_sectors(room.sector_rows)
+        room.saved_drakes = {sector.index: [] for sector in room.sectors}
+        for owner, record in zip(drakes.sector[slots].tolist(), drakes.records(slots)):
+            room.saved_drakes[owner].append(record)
+        drakes.release(slots)
+        for sector in room.sectors:
+            for edge in EDGES:
+                neighbour = sector.getNeighbour(edge)
+                if neighbour is None:
+                    continue
+                for other_edge in EDGES:
+                    if neighbour.getNeighbour(other_edge) is sector:
+                        setattr(neighbour, "connects_" + other_edge, None)
+            for door in sector.doors.values():
+                door.sectors.remove(sector)
+            del self.sectors[sector.index]
+
+        room.sectors = []
+        room._wall_table = None
+        room.loaded = False
+        room.generation += 1
+        del self.loaded_rooms[room]
+
+    def stream_rooms(self) -> None:
+        """ 
+            Keep loaded rooms under the sector budget by unloading 
+            the ones left longest ago, once they've been idle a while.
+        """
 
-        #attempt to connect with unconnected sectors
-        A = sector.pos_a
-        B = sector.pos_b
-        C = sector.pos_c
-        D = sector.pos_d
+        for room in self.active_rooms:
+            del self.loaded_rooms[room]
+            self.loaded_rooms[room] = self.frame
 
-        for s2 in self.unconnected_sectors:
+        if len(self.sectors) <= self.sector_budget:
+            return
 
-            if s2 is sector:
+        for room, last_active in list(self.loaded_rooms.items()):
+            if len(self.sectors) <= self.sector_budget \
+                or self.frame - last_active < ROOM_IDLE_FRAMES:
+                break
+            if room.active or room is self.player.room \
+                or (self.player.sector is not None and room is self.player.sector.room):
                 continue
-
-            hasA = False
-            hasB = False
-            hasC = False
-            hasD = False
-            corners = s2.getCorners()
-            #do any corners match?
-            for corner in corners:
-                if near(A[0], corner[0]) and near(A[1], corner[1]):
-                    hasA = True
-                elif near(B[0], corner[0]) and near(B[1], corner[1]):
-                    hasB = True
-                elif near(C[0], corner[0]) and near(C[1], corner[1]):
-                    hasC = True
-                elif near(D[0], corner[0]) and near(D[1], corner[1]):
-                    hasD = True
-            if hasA and hasB:
-                sector.connects_ab = s2
-                s2.connects_cd = sector
-            elif hasB and hasC:
-                sector.connects_bc = s2
-                s2.connects_da = sector
-            elif hasC and hasD:
-                sector.connects_cd = s2
-                s2.connects_ab = sector
-            elif hasD and hasA:
-                sector.connects_da = s2
-                s2.connects_bc = sector
-        
-        for sector in self.unconnected_sectors:
-            if sector.is_connected():
-                self.unconnected_sectors.remove(sector)
+            self.unload_room(room)
 
     def find_room(self, tag) -> Room | None:
-        for r in self.rooms:
-            if r.tag == tag:
-                return r
-        return None
+        return self.room_tags.get(tag)
 
     def spin_player(self, amount) -> None:
 
@@ -695,18 +2599,1044 @@ class Scene:
 
         self.player.move(dx,dy)
     
+    def fire(self) -> int:
+        """ 
+            shoot along the player's direction, killing the first 
+            drake in the way. Returns its slot, -1 for a miss 
+        """
+
+        player = self.player
+        if player.sector is None:
+            return -1
+        (x, y) = player.get_position()
+        angle = math.radians(player.direction)
+        (dx, dy) = (math.cos(angle), -math.sin(angle))
+        #only drakes in the sectors the shot passes through can be hit
+        (distance, _, (_, rows)) = cast_rays(
+            self.sector_map, np.array([x]), np.array([y]), np.array([player.sector.index]),
+            np.array([dx]), np.array([dy]), np.array([RAY_REACH]))
+        slot = first_hit(self.drakes, self.drakes.in_sectors(rows), x, y, dx, dy, float(distance[0]))
+        if slot >= 0:
+            self.drakes.release(slot)
+            self.dirty = True
+        return slot
+
+    def move_drakes(self, slots: np.ndarray, dx: np.ndarray, dy: np.ndarray) -> None:
+        """ move drakes together, colliding as the player does """
+
+        drakes = self.drakes
+        x, y, sector = move_agents(
+            self.sector_map, drakes.x[slots], drakes.y[slots], drakes.sector[slots], 
+            dx, dy, drakes.size[slots])
+        drakes.place(slots, x, y, sector)
+
+    def ai_queues(self) -> tuple[np.ndarray, np.ndarray]:
+        """ 
+            The active drakes near the player and on screen, and the 
+            rest, both in slot order. Only worked out again when the 
+            active rooms or the drakes change, or every 
+            AI_REFRESH_TICKS as the player and drakes move.
+        """
+
+        drakes = self.drakes
+        key = (drakes.count, len(drakes.free))
+        if self._ai_queues is not None and self._ai_key[1:] == key \
+            and self.frame - self._ai_key[0] < AI_REFRESH_TICKS:
+            return self._ai_queues
+
+        slots = self.active_drakes()
+        #only the few within reach are worth a frustum test
+        (x, y) = self.player.get_position()
+        distance = (drakes.x[slots] - x)**2 + (drakes.y[slots] - y)**2
+        urgent = distance < AI_NEAR_DISTANCE**2
+        close = slots[urgent]
+        camera = Camera.from_player(self.player)
+        urgent[urgent] = camera.frustum_codes(drakes.x[close], drakes.y[close], drakes.size[close]) == 0
+
+        self._ai_queues = (slots[urgent], slots[~urgent])
+        self._ai_key = (self.frame,) + key
+        return self._ai_queues
+
+    def update_drakes(self) -> np.ndarray:
+        """ 
+            Let the drakes in the active rooms think, within the AI 
+            budget. Those near the player and on screen go first, 
+            then the others, both taking turns. Returns the slots 
+            that moved.
+        """
+
+        (close, rest) = self.ai_queues()
+        start = time.perf_counter()
+        moved = []
+        (self.ai_near_cursor, done_close) = self.take_turns(close, self.ai_near_cursor, start, moved)
+        (self.ai_cursor, done) = self.take_turns(rest, self.ai_cursor, start, moved)
+        thought = done_close + done
+        self.ai_stats = {
+            "thought": thought, 
+            "waiting": close.shape[0] + rest.shape[0] - thought}
+        return np.concatenate(moved)
+
+    def take_turns(self, 
+        slots: np.ndarray, cursor: int, start: float, moved: list[np.ndarray]) -> tuple[int, int]:
+        """ 
+            Let the drakes think round robin from the slot cursor on, a
+            batch at a time, until the AI budget counted from start is 
+            spent, the first AI_MIN_BATCH whatever. Adds the slots that 
+            moved to moved, returns the cursor to carry on from and 
+            how many thought.
+        """
+
+        first = np.searchsorted(slots, cursor)
+        queue = np.concatenate((slots[first:], slots[:first]))
+        done = 0
+        while done < queue.shape[0]:
+            #as many as the time left fits at the rate the last batch 
+            # went, everyone at once with no budget
+            left = self.ai_budget - 1000*(time.perf_counter() - start)
+            batch = queue.shape[0] - done
+            if math.isfinite(left):
+                fits = int(left / self.ai_rate) if self.ai_rate > 0 else AI_BATCH
+                batch = min(batch, AI_BATCH, max(fits, 0))
+                batch = max(batch, min(AI_MIN_BATCH, queue.shape[0]) - done)
+            if batch < 1:
+                break
+            batch_start = time.perf_counter()
+            moved.append(self.think(queue[done:done + batch]))
+            done += batch
+            self.ai_rate = 1000*(time.perf_counter() - batch_start) / batch
+        #so there's always something to join
+        moved.append(queue[:0])
+        if 0 < done < queue.shape[0]:
+            cursor = int(queue[done - 1]) + 1
+        return cursor, done
+
+    def think(self, slots: np.ndarray) -> np.ndarray:
+        """ 
+            one step of wandering or chasing for each drake, covering 
+            the ticks since its last, returns the slots that moved
+        """
+
+        if slots.shape[0] == 0:
+            return slots
+        drakes = self.drakes
+        rng = self.rng
+        thought = drakes.thought[slots]
+        ticks = np.where(thought < 0, 1, np.clip(self.frame - thought, 1, AI_MAX_TICKS))
+        fresh = thought < 0
+        heading = drakes.heading[slots]
+        heading[fresh] = rng.uniform(0, 2*np.pi, int(fresh.sum()))
+
+        #notice a player in plain sight, forget one who's got away
+        (player_x, player_y) = self.player.get_position()
+        to_x = player_x - drakes.x[slots]
+        to_y = player_y - drakes.y[slots]
+        distance = np.hypot(to_x, to_y)
+        state = drakes.state[slots]
+        looking = np.flatnonzero((state == DRAKE_WANDER) & (distance < DRAKE_NOTICE_DISTANCE))
+        if looking.shape[0] > 0:
+            looking = looking[line_of_sight(
+                self.sector_map, drakes.x[slots[looking]], drakes.y[slots[looking]], 
+                drakes.sector[slots[looking]], player_x, player_y)]
+            state[looking] = DRAKE_CHASE
+        state[(state == DRAKE_CHASE) & (distance > DRAKE_FORGET_DISTANCE)] = DRAKE_WANDER
+
+        #chasers in another sector make for the way into the next 
+        # one on the path, then for its middle once they're at it
+        chasing = state == DRAKE_CHASE
+        (aim_x, aim_y) = (to_x.copy(), to_y.copy())
+        if chasing.any() and self.player.sector is not None:
+            navigation = self.navigation
+            (via, _) = navigation.flow_to(self.player.sector.index)
+            via = via[drakes.sector[slots]]
+            away = np.flatnonzero(chasing & (via >= 0))
+            edges = via[away]
+            position = np.stack((drakes.x[slots[away]], drakes.y[slots[away]]), axis = 1)
+            aim = navigation.portals[edges] - position
+            there = np.hypot(aim[:,0], aim[:,1]) <= drakes.size[slots[away]]
+            aim[there] = navigation.centers[navigation.edge_to[edges[there]]] - position[there]
+            aim_x[away] = aim[:,0]
+            aim_y[away] = aim[:,1]
+        turn = np.radians(DRAKE_WANDER_TURN)*np.sqrt(ticks)
+        heading = np.where(
+            chasing, np.arctan2(aim_y, aim_x), 
+            heading + rng.uniform(-1, 1, slots.shape[0])*turn)
+        speed = np.where(chasing, DRAKE_CHASE_SPEED, DRAKE_WANDER_SPEED)*ticks
+        #chasers stop short of the player
+        speed = np.where(chasing, np.clip(distance - DRAKE_CHASE_STOP, 0, speed), speed)
+        dx = speed*np.cos(heading)
+        dy = speed*np.sin(heading)
+
+        before_x = drakes.x[slots]
+        before_y = drakes.y[slots]
+        self.move_drakes(slots, dx, dy)
+        #wanderers that walked into a wall try somewhere else
+        moved = np.abs(drakes.x[slots] - before_x) + np.abs(drakes.y[slots] - before_y)
+        stuck = ~chasing & (moved < 0.5*speed)
+        heading[stuck] = rng.uniform(0, 2*np.pi, int(stuck.sum()))
+
+        drakes.state[slots] = state
+        drakes.heading[slots] = heading
+        drakes.thought[slots] = self.frame
+        return slots[moved > 0]
+
+    def active_drakes(self) -> np.ndarray:
+        """ pool slots of the drakes in the active rooms """
+
+        rows = [row for room in self.active_rooms for row in room.sector_rows]
+        return self.drakes.in_sectors(rows)
+
+    def drakes_in_sight(self, slots: np.ndarray) -> bool:
+        """ 
+            whether any of the drakes is, or a tick's move ago could 
+            have been, in front of the player or on the map around them
+        """
+
+        if slots.shape[0] == 0:
+            return False
+        drakes = self.drakes
+        (x, y) = (drakes.x[slots], drakes.y[slots])
+        reach = drakes.size[slots]/2 + DRAKE_CHASE_SPEED*AI_MAX_TICKS
+        camera = Camera.from_player(self.player)
+        if (camera.frustum_codes(x, y, reach) == 0).any():
+            return True
+        #the map turns with the player, so anywhere its corners reach
+        (player_x, player_y) = self.player.get_position()
+        return bool((np.hypot(x - player_x, y - player_y) <= math.hypot(*CENTER) + reach).any())
+
+    def subscribe_rooms(self, listener: Callable[[list[Room], list[Room]], None]) -> None:
+        """ have listener told which rooms became active and inactive, as they do """
+
+        self.room_listeners.append(listener)
+
+    def update_doors(self) -> list[Door]:
+        """ 
+            Only doors near the player's sector can open and only 
+            open doors can close, so those are the only ones looked 
+            at, and only once the player has moved. The doors near 
+            the sector are gathered when the player enters it.
+            Returns the doors that changed.
+        """
+
+        sector = self.player.sector
+        position = self.player.get_position()
+        if sector is not self._watched_sector:
+            self._watched_sector = sector
+            self._door_check = None
+            if sector is None:
+                self.watched_doors = self.spatial_index.doors_near(position, DOOR_CLOSE_DISTANCE)
+            else:
+                #anywhere in the sector is this near its middle
+                (width, height) = sector.size
+                middle = (sector.pos_a[0] + width/2, sector.pos_a[1] + height/2)
+                self.watched_doors = self.spatial_index.doors_near(
+                    middle, DOOR_CLOSE_DISTANCE + (width + height)/2)
+        if position == self._door_check:
+            self.room_stats["doors checked"] = 0
+            return []
+        self._door_check = position
+
+        doors = set(self.open_doors)
+        doors.update(self.watched_doors)
+        doors = [
+            door for door in sorted(doors, key = lambda door: door.index)
+            if door.room_lu.active or door.room_rd.active
+        ]
+        self.room_stats["doors checked"] = len(doors)
+
+        changed = []
+        for door in doors:
+            if door.update(position):
+                self.sector_map.set_door(door.index, not door.is_open)
+                self.dirty = True
+                changed.append(door)
+            if door.is_open:
+                self.open_doors.add(door)
+            else:
+                self.open_doors.discard(door)
+        return changed
+
+    def update_rooms(self) -> None:
+        """ 
+            Keep active_rooms up to date from what changed this 
+            tick: the doors and the room the player is in. Nothing 
+            else can change a room, so no other is looked at.
+        """
+
+        touched = []
+        for door in self.update_doors():
+            touched.extend((door.room_lu, door.room_rd))
+        if self.player.room is not self.player_room:
+            touched.extend((self.player_room, self.player.room))
+            self.player.room.hold()
+            self.player_room.release()
+            self.player_room = self.player.room
+
+        #the player's room is listed at the first update
+        if not self.active_rooms:
+            touched.append(self.player_room)
+        self.room_stats["rooms changed"] = 0
+        if not touched:
+            return
+
+        listed = set(self.active_rooms)
+        touched = list(dict.fromkeys(touched))
+        activated = [room for room in touched if room.active and room not in listed]
+        deactivated = [room for room in touched if not room.active and room in listed]
+        self.room_stats["rooms changed"] = len(activated) + len(deactivated)
+        if not activated and not deactivated:
+            return
+
+        self.active_rooms = sorted(
+            [room for room in self.active_rooms if room.active] + activated, 
+            key = lambda room: room.index)
+        self.dirty = True
+        self._ai_queues = None
+        for listener in self.room_listeners:
+            listener(activated, deactivated)
+
     def update(self) -> None:
 
-        for room in self.active_rooms:
-            room.update(self.player.get_position())
+        self.frame += 1
+        self.update_rooms()
+
+        pose = (self.player.get_position(), self.player.direction)
+        if pose != self._last_pose:
+            self.dirty = True
+        self._last_pose = pose
+
+        #drakes added, shot or moved since the last tick
+        if self.drakes.revision != self._drake_revision:
+            self.dirty = True
+        moved = self.update_drakes()
+        chasing = moved[self.drakes.state[moved] == DRAKE_CHASE]
+        if self.drakes_in_sight(chasing):
+            self.dirty = True
+        elif self.drakes_in_sight(moved):
+            self.wandered = True
+        self._drake_revision = self.drakes.revision
+
+        self.stream_rooms()
+#endregion
+################ Visibility    ################################################
+#region
+#horizontal screen interval, in pixels
+window = tuple[float, float]
+
+def screen_span(camera: Camera, pos_a: vec2, pos_b: vec2) -> window | None:
+    """ horizontal screen extent of a floor segment, None if it's behind the camera """
+
+    (x_a,depth_a) = camera.to_view(pos_a)
+    (x_b,depth_b) = camera.to_view(pos_b)
+
+    if depth_a >= 0 and depth_b >= 0:
+        return None
+
+    view_line = ((x_a,depth_a),(x_b,depth_b))
+    if depth_a >= 0:
+        (x_a,depth_a) = clip_line(view_line, NEAR_PLANE)
+    if depth_b >= 0:
+        (x_b,depth_b) = clip_line(view_line, NEAR_PLANE)
+
+    x_a = x_a / max(-depth_a, 0.01) * (SCREEN_WIDTH//2) + CENTER[0]
+    x_b = x_b / max(-depth_b, 0.01) * (SCREEN_WIDTH//2) + CENTER[0]
+    return (min(x_a, x_b), max(x_a, x_b))
+
+def find_visible_sectors(camera: Camera, start: Sector) -> dict[Sector, window]:
+    """
+        Portal traversal: starting from the camera's sector, 
+        walk into neighbouring sectors through open edges and open 
+        doors, narrowing the horizontal window through each one.
+
+        Returns every sector reached, with the hull of the windows 
+        it was seen through.
+    """
+
+    visible = {start: (0, SCREEN_WIDTH)}
+    pending = [(start, (0, SCREEN_WIDTH))]
+
+    while pending:
+        sector, (left, right) = pending.pop()
+
+        for edge, (pos_a, pos_b) in sector.getEdges().items():
+
+            neighbour = sector.getNeighbour(edge)
+            if neighbour is None or sector.hasWall(edge) \
+                or not neighbour.room.active:
+                continue
 
-        self.active_rooms = []
-        for room in self.rooms:
-            if room.active:
-                self.active_rooms.append(room)
+            door = sector.doors.get(edge)
+            if door is not None and not door.is_open:
+                continue
+
+            #a portal the camera stands on is edge on and has no 
+            # width, but everything past it may be in view
+            if segment_distance(camera.position, pos_a, pos_b) <= PORTAL_EPSILON:
+                span = (0, SCREEN_WIDTH)
+            else:
+                span = screen_span(camera, pos_a, pos_b)
+            if span is None:
+                continue
+
+            new_left = max(left, span[0])
+            new_right = min(right, span[1])
+            if new_left >= new_right:
+                continue
+
+            #skip windows we've already looked through
+            if neighbour in visible:
+                (seen_left, seen_right) = visible[neighbour]
+                if seen_left <= new_left and new_right <= seen_right:
+                    continue
+                new_left = min(new_left, seen_left)
+                new_right = max(new_right, seen_right)
+
+            visible[neighbour] = (new_left, new_right)
+            pending.append((neighbour, (new_left, new_right)))
+
+    return visible
+
+class ColumnBuffer:
+    """
+        Depth of the nearest opaque wall in each screen column.
+        Walls are added front to back, so anything further away 
+        than the buffer across all of its columns can't be seen.
+    """
+
+
+    def __init__(self, width: int = SCREEN_WIDTH):
+
+        self.depth = np.full(width, np.inf)
+        #furthest depth still written, everything beyond is hidden
+        self.far = np.inf
+
+    def columns(self, 
+        x_a: float, x_b: float, inner: bool = False) -> slice | None:
+        """ 
+            on-screen columns between two screen x, 
+            inner leaves out columns only partly covered
+        """
+
+        if x_b < x_a:
+            (x_a, x_b) = (x_b, x_a)
+        if inner:
+            left = max(math.ceil(x_a), 0)
+            right = min(math.floor(x_b), self.depth.shape[0] - 1)
+        else:
+            left = max(math.floor(x_a), 0)
+            right = min(math.ceil(x_b), self.depth.shape[0] - 1)
+        if right < left:
+            return None
+        return slice(left, right + 1)
+
+    def depths(self, 
+        columns: slice, 
+        x_a: float, x_b: float, depth_a: float, depth_b: float) -> np.ndarray:
+        """ depth of a segment in each column """
+
+        #depth isn't linear across the screen, its inverse is
+        if abs(x_b - x_a) < 1e-9:
+            return np.full(columns.stop - columns.start, min(depth_a, depth_b))
+        x = np.arange(columns.start, columns.stop, dtype = float)
+        t = np.clip((x - x_a) / (x_b - x_a), 0.0, 1.0)
+        return 1 / ((1 - t)/depth_a + t/depth_b)
+
+    def hidden(self, x_a: float, x_b: float, depth_a: float, depth_b: float) -> bool:
+
+        if min(depth_a, depth_b) >= self.far:
+            return True
+        columns = self.columns(x_a, x_b)
+        if columns is None:
+            return True
+        buffer = self.depth[columns]
+        nearest = buffer.min()
+        if max(depth_a, depth_b) < nearest:
+            return False
+        if min(depth_a, depth_b) >= buffer.max():
+            return True
+        return bool((self.depths(columns, x_a, x_b, depth_a, depth_b) >= buffer).all())
+
+    def fill(self, x_a: float, x_b: float, depth_a: float, depth_b: float) -> None:
+
+        columns = self.columns(x_a, x_b, inner = True)
+        if columns is None:
+            return
+        buffer = self.depth[columns]
+        np.minimum(buffer, self.depths(columns, x_a, x_b, depth_a, depth_b), out = buffer)
+        self.far = self.depth.max()
+
+def occlude_walls(
+    walls: list[Wall], spans: np.ndarray, 
+    buffer: ColumnBuffer) -> np.ndarray:
+    """
+        Rows of the walls with some column in front of everything 
+        nearer, nearest first. Walls and closed doors hide what's 
+        behind them, open doors don't.
+    """
+
+    order = np.argsort(spans[:,:,1].min(axis = 1), kind = "stable")
+    keep = []
+    for row, ((x_a, depth_a), (x_b, depth_b)) in zip(order.tolist(), spans[order].tolist()):
+        if buffer.hidden(x_a, x_b, depth_a, depth_b):
+            continue
+        keep.append(row)
+        wall = walls[row]
+        if not (isinstance(wall, Door) and wall.is_open):
+            buffer.fill(x_a, x_b, depth_a, depth_b)
+    return np.array(keep, dtype = int)
+
+def project_visible_walls(
+    visible: dict[Sector, window], 
+    camera: Camera) -> tuple[list[Wall], np.ndarray, np.ndarray, int]:
+    """
+        Project the walls and doors of the visible sectors, 
+        dropping those outside the window their sector was seen through.
+
+        Returns the walls left, their edge tables and spans as from
+        project_walls, and how many were off screen before projection.
+    """
+
+    walls: list[Wall] = []
+    windows: list[window] = []
+    door_rows: dict[Door, int] = {}
+    for sector, (left, right) in visible.items():
+        for wall in sector.walls:
+            walls.append(wall)
+            windows.append((left, right))
+        for door in sector.doors.values():
+            if door in door_rows:
+                row = door_rows[door]
+                windows[row] = (min(windows[row][0], left), max(windows[row][1], right))
+                continue
+            door_rows[door] = len(walls)
+            walls.append(door)
+            windows.append((left, right))
+
+    table = WallTable(walls)
+    rows = walls_in_frustum(table, camera)
+    culled = len(walls) - rows.shape[0]
+    indices, edge_tables, spans = project_walls(table.take(rows), camera, spans = True)
+    indices = rows[indices]
+
+    bounds = np.array(windows, dtype = float).reshape(-1, 2)[indices]
+    xs = edge_tables[:,:,0]
+    inside = (xs.max(axis = 1) >= bounds[:,0]) & (xs.min(axis = 1) <= bounds[:,1])
+
+    return (
+        [walls[index] for index in indices[inside].tolist()], 
+        edge_tables[inside], spans[inside], culled)
+#endregion
+################ Profiling     ################################################
+#region
+class FrameProfiler:
+    """
+        Times named stages of each frame and keeps per-frame counters,
+        over a rolling window of the most recent frames.
+
+        Every stage and counter is a ring of samples, one per frame, 
+        so percentiles are always over the same frames.
+    """
+
+    def __init__(self, 
+        window: int = PROFILE_WINDOW, 
+        clock: Callable[[], float] = time.perf_counter):
+
+        self.window = window
+        self.clock = clock
+        #milliseconds per stage and counts, by name, one slot per frame
+        self.samples: dict[str, np.ndarray] = {}
+        self.frames = 0
+        self.current: dict[str, float] = {}
+        self.frame_start = 0.0
+
+    def begin_frame(self) -> None:
+
+        self.current = {}
+        self.frame_start = self.clock()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+
+        start = self.clock()
+        try:
+            yield
+        finally:
+            elapsed = 1000*(self.clock() - start)
+            self.current[name] = self.current.get(name, 0.0) + elapsed
+
+    def count(self, name: str, value: float) -> None:
+
+        self.current[name] = self.current.get(name, 0.0) + value
+
+    def end_frame(self, keep: bool = True) -> None:
+        """ file the frame's samples, or throw them away """
+
+        if not keep:
+            return
+        self.current["frame"] = 1000*(self.clock() - self.frame_start)
+
+        slot = self.frames % self.window
+        for name in self.current.keys() - self.samples.keys():
+            self.samples[name] = np.zeros(self.window)
+        for name, samples in self.samples.items():
+            samples[slot] = self.current.get(name, 0.0)
+        self.frames += 1
+
+    def recent(self, name: str) -> np.ndarray:
+        """ samples of the frames in the window, oldest first """
+
+        samples = self.samples.get(name)
+        if samples is None or self.frames == 0:
+            return np.zeros(0)
+        if self.frames < self.window:
+            return samples[:self.frames]
+        slot = self.frames % self.window
+        return np.concatenate((samples[slot:], samples[:slot]))
+
+    def percentiles(self, 
+        name: str, 
+        percentiles: tuple[float] = PROFILE_PERCENTILES) -> dict[str, float]:
+
+        samples = self.recent(name)
+        if samples.shape[0] == 0:
+            return {f"p{p}": 0.0 for p in percentiles}
+        values = np.percentile(samples, percentiles)
+        return {f"p{p}": float(value) for p, value in zip(percentiles, values)}
+
+    def summary(self) -> dict[str, dict[str, float]]:
+
+        summary = {}
+        for name in sorted(self.samples):
+            samples = self.recent(name)
+            summary[name] = {
+                **self.percentiles(name),
+                "mean": float(samples.mean()) if samples.shape[0] else 0.0,
+                "max": float(samples.max()) if samples.shape[0] else 0.0,
+            }
+        return summary
+
+    def rows(self) -> tuple[list[str], list[list[float]]]:
+        """ column names and one row per frame in the window """
+
+        names = sorted(self.samples)
+        columns = [self.recent(name).tolist() for name in names]
+        first = self.frames - len(columns[0]) if columns else 0
+        rows = [[first + i, *values] for i, values in enumerate(zip(*columns))]
+        return ["frame_index", *names], rows
+
+    def export_csv(self, filename: str) -> None:
+
+        header, rows = self.rows()
+        with open(filename, "w", newline = "") as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    def export_json(self, filename: str) -> None:
+
+        header, rows = self.rows()
+        with open(filename, "w") as file:
+            json.dump({
+                "frames": self.frames,
+                "window": self.window,
+                "summary": self.summary(),
+                "samples": [dict(zip(header, row)) for row in rows],
+            }, file, indent = 1)
 #endregion
 ################ View    ######################################################
 #region
+class HeadlessCanvas:
+    """
+        Display-less stand-in for tk.Canvas.
+
+        Views draw onto it exactly as they would onto a real canvas.
+        With record=True every item is kept (a recording sink) so
+        frames can be inspected, otherwise calls are only counted
+        (a null sink).
+    """
+
+    def __init__(self, 
+        width: int = SCREEN_WIDTH, height: int = SCREEN_HEIGHT, 
+        record: bool = True):
+
+        self.width = width
+        self.height = height
+        self.record = record
+        self.items: dict[int, tuple[str, tuple, dict]] = {}
+        self.next_id = 1
+        self.call_count = 0
+
+    def create_item(self, kind: str, coords: tuple, options: dict) -> int:
+
+        self.call_count += 1
+        item = self.next_id
+        self.next_id += 1
+        if self.record:
+            self.items[item] = (kind, coords, options)
+        return item
+
+    def create_line(self, *coords, **options) -> int:
+
+        return self.create_item("line", coords, options)
+
+    def create_oval(self, *coords, **options) -> int:
+
+        return self.create_item("oval", coords, options)
+
+    def coords(self, item: int, *coords) -> None:
+
+        self.call_count += 1
+        if self.record and item in self.items:
+            kind, _, options = self.items[item]
+            self.items[item] = (kind, coords, options)
+
+    def itemconfig(self, item: int, **options) -> None:
+
+        self.call_count += 1
+        if self.record and item in self.items:
+            kind, coords, old_options = self.items[item]
+            self.items[item] = (kind, coords, {**old_options, **options})
+
+    def delete(self, *items) -> None:
+
+        self.call_count += 1
+        for item in items:
+            if item == "all":
+                self.items.clear()
+            else:
+                self.items.pop(item, None)
+
+    def create_image(self, *coords, **options) -> int:
+
+        return self.create_item("image", coords, options)
+
+    def pack(self, **kwargs) -> None:
+
+        pass
+
+class HeadlessImage:
+    """
+        Display-less stand-in for tk.PhotoImage. Keeps the last 
+        image sent, and writes it to path if one is given.
+    """
+
+    def __init__(self, path: str = None):
+
+        self.path = path
+        self.data: bytes = b""
+        self.call_count = 0
+
+    def configure(self, **options) -> None:
+
+        self.call_count += 1
+        self.data = options.get("data", self.data)
+        if self.path is not None:
+            with open(self.path, "wb") as file:
+                file.write(self.data)
+
+class DisplayList:
+    """
+        One frame of drawing as flat arrays: lines and ovals as
+        (n, 4) screen coordinates, each with a colour index and a 
+        key naming its geometry the same way every frame, in the
+        order they were drawn. Building one never touches Tk, so it
+        can be filled on another thread and submitted later.
+    """
+
+    def __init__(self, capacity: int = 256):
+
+        self.lines = np.zeros((capacity, 4))
+        self.line_colors = np.zeros(capacity, dtype = np.uint8)
+        self.line_keys = np.zeros(capacity, dtype = np.int64)
+        self.line_count = 0
+        self.ovals = np.zeros((capacity, 4))
+        self.oval_colors = np.zeros(capacity, dtype = np.uint8)
+        self.oval_keys = np.zeros(capacity, dtype = np.int64)
+        self.oval_count = 0
+        #the building view's counters for this frame
+        self.stats: dict[str, int] = {}
+    
+    def clear(self) -> None:
+
+        self.line_count = 0
+        self.oval_count = 0
+        self.stats = {}
+
+    def reserve(self, kind: str, count: int) -> int:
+        """ make room for count more of a kind, returns where they go """
+
+        used = self.line_count if kind == "line" else self.oval_count
+        coords = getattr(self, kind + "s")
+        if used + count > coords.shape[0]:
+            capacity = max(2*coords.shape[0], used + count)
+            for name in (kind + "s", kind + "_colors", kind + "_keys"):
+                old = getattr(self, name)
+                grown = np.zeros((capacity, *old.shape[1:]), dtype = old.dtype)
+                grown[:used] = old[:used]
+                setattr(self, name, grown)
+        if kind == "line":
+            self.line_count += count
+        else:
+            self.oval_count += count
+        return used
+
+    def line(self, 
+        x_a: float, y_a: float, x_b: float, y_b: float, 
+        color: str, key: int) -> None:
+
+        i = self.reserve("line", 1)
+        self.lines[i] = (x_a, y_a, x_b, y_b)
+        self.line_colors[i] = COLOR_INDEX[color]
+        self.line_keys[i] = key
+
+    def add_lines(self, lines: np.ndarray, color: str, keys: np.ndarray) -> None:
+        """ many (n, 4) lines of one colour """
+
+        i = self.reserve("line", lines.shape[0])
+        self.lines[i:self.line_count] = lines
+        self.line_colors[i:self.line_count] = COLOR_INDEX[color]
+        self.line_keys[i:self.line_count] = keys
+
+    def oval(self, 
+        x_a: float, y_a: float, x_b: float, y_b: float, 
+        color: str, key: int) -> None:
+
+        i = self.reserve("oval", 1)
+        self.ovals[i] = (x_a, y_a, x_b, y_b)
+        self.oval_colors[i] = COLOR_INDEX[color]
+        self.oval_keys[i] = key
+
+    def line_table(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ coordinates, colours and keys of the lines """
+
+        n = self.line_count
+        return self.lines[:n], self.line_colors[:n], self.line_keys[:n]
+
+    def oval_table(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ coordinates, colours and keys of the ovals """
+
+        n = self.oval_count
+        return self.ovals[:n], self.oval_colors[:n], self.oval_keys[:n]
+
+def rasterize_lines(pixels: np.ndarray, lines: np.ndarray, colors: np.ndarray) -> None:
+    """
+        Draw (n, 4) integer lines into an (h, w, 3) image, all at 
+        once: every line is clipped to the image, then stepped one 
+        pixel at a time along its longer axis, later lines landing 
+        on top.
+    """
+
+    if lines.shape[0] == 0:
+        return
+
+    (height, width, _) = pixels.shape
+    x_a, y_a, x_b, y_b = lines.T.astype(float)
+    dx = x_b - x_a
+    dy = y_b - y_a
+
+    #Liang-Barsky against the image rectangle
+    start = np.zeros(lines.shape[0])
+    end = np.ones(lines.shape[0])
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        for p, q in ((-dx, x_a), (dx, width - 1 - x_a), (-dy, y_a), (dy, height - 1 - y_a)):
+            r = q / p
+            start = np.where(p < 0, np.maximum(start, r), start)
+            end = np.where(p > 0, np.minimum(end, r), end)
+            #parallel to this edge and outside it
+            end = np.where((p == 0) & (q < 0), -1, end)
+    keep = start <= end
+    colors = colors[keep]
+    (x_a, y_a, x_b, y_b) = (
+        np.rint(x_a[keep] + start[keep]*dx[keep]), np.rint(y_a[keep] + start[keep]*dy[keep]),
+        np.rint(x_a[keep] + end[keep]*dx[keep]), np.rint(y_a[keep] + end[keep]*dy[keep]))
+    dx = x_b - x_a
+    dy = y_b - y_a
+    steps = np.maximum(np.abs(dx), np.abs(dy)).astype(int)
+
+    #one row per pixel: which line it's on and how far along
+    line, step = runs(steps + 1)
+    t = step / np.maximum(steps[line], 1)
+    x = np.rint(x_a[line] + t*dx[line]).astype(int)
+    y = np.rint(y_a[line] + t*dy[line]).astype(int)
+
+    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    pixels[y[inside], x[inside]] = colors[line[inside]]
+
+def runs(counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ for runs of the given lengths laid end to end: each element's run, and its place in it """
+
+    run = np.repeat(np.arange(counts.shape[0]), counts)
+    first = np.cumsum(counts) - counts
+    return run, np.arange(run.shape[0]) - first[run]
+
+def rasterize_ovals(pixels: np.ndarray, boxes: np.ndarray, colors: np.ndarray) -> None:
+    """ filled ellipses in (n, 4) bounding boxes, all at once as one span per row """
+
+    if boxes.shape[0] == 0:
+        return
+
+    (height, width, _) = pixels.shape
+    x_a, y_a, x_b, y_b = boxes.T
+    center_x = (x_a + x_b) / 2
+    center_y = (y_a + y_b) / 2
+    radius_x = np.maximum(np.abs(x_b - x_a) / 2, 0.5)
+    radius_y = np.maximum(np.abs(y_b - y_a) / 2, 0.5)
+
+    top = np.maximum(np.floor(center_y - radius_y), 0).astype(int)
+    bottom = np.minimum(np.ceil(center_y + radius_y) + 1, height).astype(int)
+    oval, row = runs(np.maximum(bottom - top, 0))
+    y = top[oval] + row
+
+    offset = np.clip((y + 0.5 - center_y[oval]) / radius_y[oval], -1, 1)
+    half = radius_x[oval] * np.sqrt(1 - offset*offset)
+    left = np.clip(np.rint(center_x[oval] - half), 0, width).astype(int)
+    right = np.clip(np.rint(center_x[oval] + half), 0, width).astype(int)
+
+    span, column = runs(np.maximum(right - left, 0))
+    pixels[y[span], left[span] + column] = colors[oval[span]]
+
+class FramebufferSurface:
+    """
+        Software rasterizer taking the same drawing calls as 
+        CanvasItemPool. Lines and ovals are gathered over the 
+        frame, drawn into a NumPy image at the end of it and 
+        handed to Tk as one image, so a frame is a single Tk call
+        however much is on screen.
+    """
+
+    def __init__(self, 
+        canvas: "tk.Canvas | HeadlessCanvas", 
+        width: int = SCREEN_WIDTH, height: int = SCREEN_HEIGHT, 
+        path: str = None):
+        """ path is where a headless surface writes its frames, if anywhere """
+
+        self.canvas = canvas
+        self.width = width
+        self.height = height
+        self.pixels = np.zeros((height, width, 3), dtype = np.uint8)
+        self.header = f"P6 {width} {height} 255 ".encode()
+
+        if isinstance(canvas, HeadlessCanvas):
+            self.image = HeadlessImage(path)
+        else:
+            self.image = tk.PhotoImage(master = canvas, width = width, height = height)
+        canvas.create_image(0, 0, anchor = "nw", image = self.image)
+
+        #rgb of each colour index
+        self.palette = np.array(tuple(COLOR_RGB.values()), dtype = np.uint8)
+        self.used: dict[str, int] = {"line": 0, "oval": 0}
+        self.stats = {"lines": 0, "ovals": 0, "tcl calls": 0}
+
+    def submit(self, commands: DisplayList) -> None:
+        """ rasterize a frame's display list and upload it """
+
+        lines, line_colors, _ = commands.line_table()
+        ovals, oval_colors, _ = commands.oval_table()
+
+        pixels = self.pixels
+        pixels.fill(0)
+        rasterize_ovals(pixels, ovals, self.palette[oval_colors])
+        rasterize_lines(pixels, lines.astype(int), self.palette[line_colors])
+
+        self.image.configure(data = self.header + pixels.tobytes(), format = "PPM")
+        self.used = {"line": lines.shape[0], "oval": ovals.shape[0]}
+        self.stats = {"lines": lines.shape[0], "ovals": ovals.shape[0], "tcl calls": 1}
+
+def drawing_surface(
+    canvas: "tk.Canvas | HeadlessCanvas", 
+    backend: str = RENDER_BACKEND) -> "CanvasItemPool | FramebufferSurface":
+
+    if backend == "framebuffer":
+        return FramebufferSurface(canvas)
+    return CanvasItemPool(canvas)
+
+class CanvasItemPool:
+    """
+        Retained canvas items, one per display list key.
+
+        Each frame's display list is diffed against the last one by
+        key, on whole pixels, so Tk only hears about geometry that 
+        was inserted, moved, recoloured or removed. Removed items are
+        hidden and reused for the next insertions.
+    """
+
+    def __init__(self, canvas: "tk.Canvas | HeadlessCanvas"):
+
+        self.canvas = canvas
+        #per kind: key -> (item, coords, colour) as last sent
+        self.shown: dict[str, dict] = {"line": {}, "oval": {}}
+        #hidden items, free to reuse
+        self.spare: dict[str, list[int]] = {"line": [], "oval": []}
+        self.used: dict[str, int] = {"line": 0, "oval": 0}
+        #per frame: items made, hidden ones brought back, and those 
+        # moved, recoloured, hidden (removed) or left alone
+        self.stats = {
+            "created": 0, "reused": 0, "moved": 0, "recolored": 0, "removed": 0,
+            "unchanged": 0, "tcl calls": 0}
+
+    def submit(self, commands: DisplayList) -> None:
+        """ bring the canvas in line with a frame's display list """
+
+        self.stats = {key: 0 for key in self.stats}
+        for kind, (coords, colors, keys) in (
+            ("line", commands.line_table()), ("oval", commands.oval_table())):
+            self.used[kind] = coords.shape[0]
+            self.diff(kind, np.rint(coords).astype(int).tolist(), colors.tolist(), keys.tolist())
+
+    def diff(self, kind: str, coords: list, colors: list[int], keys: list[int]) -> None:
+
+        canvas = self.canvas
+        stats = self.stats
+        spare = self.spare[kind]
+        last = self.shown[kind]
+        shown = {}
+
+        for key, row, color in zip(keys, coords, colors):
+            if key in shown:
+                #drawn more than once, eg. a door seen from both its rooms
+                repeat = 1
+                while (key, repeat) in shown:
+                    repeat += 1
+                key = (key, repeat)
+            row = tuple(row)
+            color = COLOR_NAMES[color]
+
+            entry = last.pop(key, None)
+            if entry is None:
+                if spare:
+                    item = spare.pop()
+                    canvas.coords(item, *row)
+                    canvas.itemconfig(item, fill = color, state = "normal")
+                    stats["reused"] += 1
+                    stats["tcl calls"] += 2
+                elif kind == "line":
+                    item = canvas.create_line(*row, fill = color)
+                    stats["created"] += 1
+                    stats["tcl calls"] += 1
+                else:
+                    item = canvas.create_oval(*row, fill = color)
+                    stats["created"] += 1
+                    stats["tcl calls"] += 1
+            else:
+                (item, old_row, old_color) = entry
+                if old_row != row:
+                    canvas.coords(item, *row)
+                    stats["moved"] += 1
+                    stats["tcl calls"] += 1
+                if old_color != color:
+                    canvas.itemconfig(item, fill = color)
+                    stats["recolored"] += 1
+                    stats["tcl calls"] += 1
+                if old_row == row and old_color == color:
+                    stats["unchanged"] += 1
+            shown[key] = (item, row, color)
+
+        for item, _, _ in last.values():
+            canvas.itemconfig(item, state = "hidden")
+            spare.append(item)
+            stats["removed"] += 1
+            stats["tcl calls"] += 1
+        self.shown[kind] = shown
+
 class StatusBar(tk.Frame):
 
     def __init__(self, parent: tk.Tk, **kwargs):
@@ -723,8 +3653,12 @@ class StatusBar(tk.Frame):
         self.room_label.pack(side = tk.LEFT)
 
         self.active_rooms_label = tk.Label(self, text = "Active Rooms:")
+        self.active_rooms_label.pack(side = tk.LEFT)
+
+        self.profile_label = tk.Label(self, text = "Frame:")
+        self.profile_label.pack(side = tk.LEFT)
     
-    def redraw(self, scene: Scene) -> None:
+    def redraw(self, scene: Scene, profiler: FrameProfiler = None) -> None:
 
         player = scene.player
         x,y = round(player.get_position())
@@ -734,137 +3668,263 @@ class StatusBar(tk.Frame):
         self.room_label.config(text = f"Room: {player.room.tag}")
         self.active_rooms_label.config(text = f"Active Rooms: {len(scene.active_rooms)}")
 
-class MapView(tk.Canvas):
+        if profiler is not None and profiler.frames > 0:
+            frame = profiler.percentiles("frame")
+            build = profiler.percentiles("build")
+            game = profiler.percentiles("game view")
+            items = profiler.percentiles("canvas items")
+            calls = profiler.percentiles("tcl calls")
+            self.profile_label.config(text = 
+                f"Frame p50/p99: {frame['p50']:.1f}/{frame['p99']:.1f} ms, "
+                f"build/game p99: {build['p99']:.1f}/{game['p99']:.1f} ms, "
+                f"items/Tcl calls p50: {items['p50']:.0f}/{calls['p50']:.0f}")
 
-    def __init__(self, parent: tk.Tk, **kwargs):
+class MapView:
 
-        super().__init__(master = parent, bg="black", **kwargs)
+    def __init__(self, 
+        canvas: "tk.Canvas | HeadlessCanvas", backend: str = RENDER_BACKEND):
+
+        self.canvas = canvas
+        self.pool = drawing_surface(canvas, backend)
+        #built into, and last built: swapped as each build finishes
+        self.commands = DisplayList()
+        self.front = DisplayList()
     
-    def redraw(self, scene: Scene):
+    def redraw(self, scene: Scene, camera: Camera):
+
+        self.submit(self.build(scene, camera))
+
+    def build(self, scene: Scene, camera: Camera) -> DisplayList:
+        """ the frame's display list, made without touching Tk """
 
-        self.delete("all")
+        self.commands.clear()
 
         for room in scene.active_rooms:
             
-            self.draw_walls(room, scene.player)
+            self.draw_walls(room, camera, scene.player.sector)
             
-            self.draw_doors(room, scene.player)
+            self.draw_doors(room, camera)
 
-            for sector in room.getSectors():
-
-                for drake in sector.drake_nanas:
-                    self.draw_entity(drake, "yellow", scene.player)
+        for drake in scene.drakes.views(scene.active_drakes()):
+            self.draw_entity(drake, "yellow", camera)
         
-        self.create_oval(CENTER[0] - 6, CENTER[1] - 6, CENTER[0] + 6, CENTER[1] + 6, fill = "red")
+        self.commands.oval(
+            CENTER[0] - 6, CENTER[1] - 6, CENTER[0] + 6, CENTER[1] + 6, 
+            "red", display_key(KEY_HUD, 0))
+
+        self.front, self.commands = self.commands, self.front
+        return self.front
+
+    def submit(self, commands: DisplayList = None) -> None:
+        """ hand a built display list, by default the last, to Tk """
+
+        self.pool.submit(self.front if commands is None else commands)
     
     def draw_walls(self, 
-        room: Room, camera: Player) -> None:
+        room: Room, camera: Camera, camera_sector: Sector) -> None:
 
-        camera_position = camera.get_position()
-        camera_direction = camera.direction
-        camera_sector = camera.sector
+        lines = camera.cached(
+            ("map walls", room, room.generation), 
+            lambda: [
+                (sector, [self.project_line(wall, camera) for wall in sector.walls])
+                for sector in room.sectors
+            ]
+        )
 
-        for sector in room.sectors:
+        for sector, sector_lines in lines:
                 color = "green"
                 if sector is camera_sector:
                     color = "red"
-                for wall in sector.walls:
-                    pos_a = translate(
-                        world_to_view_transform(
-                            wall.pos_a, camera_position, camera_direction),
-                        CENTER
-                    )
-                    pos_b = translate(
-                        world_to_view_transform(
-                            wall.pos_b, camera_position, camera_direction), 
-                        CENTER
-                    )
-                    self.create_line(pos_a[0], pos_a[1], pos_b[0], pos_b[1], fill = color)
+                for wall, line in zip(sector.walls, sector_lines):
+                    self.commands.line(
+                        *line, color, display_key(KEY_WALL, wall.key*WALL_KEY_LINES))
     
     def draw_doors(self,
-        room: Room, camera: Player) -> None:
+        room: Room, camera: Camera) -> None:
 
-        camera_position = camera.get_position()
-        camera_direction = camera.direction
+        lines = camera.cached(
+            ("map doors", room, room.generation),
+            lambda: [self.project_line(door, camera) for door in room.doors]
+        )
 
-        for door in room.doors:
+        for door, line in zip(room.doors, lines):
 
             color = "yellow"
             if door.is_open:
                 color = "cyan"
             
-            pos_a = translate(
-                world_to_view_transform(
-                    door.pos_a, camera_position, camera_direction),
-                    CENTER
-            )
-            
-            pos_b = translate(
-                world_to_view_transform(
-                    door.pos_b, camera_position, camera_direction), 
-                CENTER
-            )
-            
-            self.create_line(pos_a[0], pos_a[1], pos_b[0], pos_b[1], fill = color)
+            self.commands.line(
+                *line, color, display_key(KEY_WALL, door.key*WALL_KEY_LINES))
 
-    def draw_entity(self, entity: Entity, color: str, camera: Player) -> None:
+    def project_line(self, wall: Wall, camera: Camera) -> tuple[float, float, float, float]:
 
-        camera_position = camera.get_position()
-        camera_direction = camera.direction
+        pos_a = translate(camera.to_view(wall.pos_a), CENTER)
+        pos_b = translate(camera.to_view(wall.pos_b), CENTER)
+        return (pos_a[0], pos_a[1], pos_b[0], pos_b[1])
 
-        pos = translate(
-            world_to_view_transform(
-                entity.get_position(), camera_position, camera_direction
-            ),CENTER)
+    def draw_entity(self, entity: Entity, color: str, camera: Camera) -> None:
+
+        pos = translate(camera.to_view(entity.get_position()), CENTER)
         
         radius = int(entity.get_size() / 2)
-        self.create_oval(
+        self.commands.oval(
             pos[0] - radius, pos[1] - radius, 
             pos[0] + radius, pos[1] + radius, 
-            fill = color)
-
-class GameView(tk.Canvas):
+            color, display_key(KEY_DRAKE, entity.slot))
 
-    def __init__(self, parent: tk.Tk, **kwargs):
+class GameView:
 
-        super().__init__(master = parent, bg="black", **kwargs)
+    def __init__(self, 
+        canvas: "tk.Canvas | HeadlessCanvas", 
+        batched: bool = True, portals: bool = True, occlusion: bool = True,
+        backend: str = RENDER_BACKEND):
+        """ occlusion needs the batched or portal path """
+
+        self.canvas = canvas
+        self.pool = drawing_surface(canvas, backend)
+        self.batched = batched
+        self.portals = portals
+        self.occlusion = occlusion
+        #what the walls drawn this frame hide, if anything
+        self.columns: ColumnBuffer = None
+        self._wall_table: WallTable = None
+        #the scene whose room changes drop the merged table
+        self.scene: Scene = None
+        #walls drawn last frame, and what culling dropped before projection
+        self.cull_stats = {"drawn": 0, "walls": 0, "sectors": 0, "drakes": 0, "occluded": 0}
+        #built into, and last built: swapped as each build finishes
+        self.commands = DisplayList()
+        self.front = DisplayList()
 
         self.crosshair_lines = (
             ((CENTER[0] - 8,     CENTER[1]), (CENTER[0] + 8,     CENTER[1])),
             ((    CENTER[0], CENTER[1] - 8), (    CENTER[0], CENTER[1] + 8))
         )
 
-    def redraw(self, scene: Scene):
+    def redraw(self, scene: Scene, camera: Camera):
 
-        self.delete("all")
+        self.submit(self.build(scene, camera))
 
-        for room in scene.active_rooms:
-            
-            self.draw_walls(room, scene.player)
-            
-            self.draw_doors(room, scene.player)
+    def build(self, scene: Scene, camera: Camera) -> DisplayList:
+        """ the frame's display list, made without touching Tk """
+
+        self.watch(scene)
+        self.commands.clear()
+        self.cull_stats = {"drawn": 0, "walls": 0, "sectors": 0, "drakes": 0, "occluded": 0}
+        self.columns = None
 
-            for sector in room.getSectors():
-                for drake in sector.drake_nanas:
-                    self.draw_entity(drake, scene.player)
+        if self.portals and scene.player.sector is not None:
+            self.draw_portals(scene, camera)
+        else:
+            self.draw_rooms(scene, camera)
         
         #crosshair
-        for line in self.crosshair_lines:
+        for i, line in enumerate(self.crosshair_lines):
             pos_a, pos_b = line
-            self.create_line(
+            self.commands.line(
                 pos_a[0], pos_a[1], 
-                pos_b[0], pos_b[1], fill="white")
+                pos_b[0], pos_b[1], "white", display_key(KEY_HUD, i))
+
+        self.commands.stats = dict(self.cull_stats)
+        self.front, self.commands = self.commands, self.front
+        return self.front
+
+    def submit(self, commands: DisplayList = None) -> None:
+        """ hand a built display list, by default the last, to Tk """
+
+        self.pool.submit(self.front if commands is None else commands)
+
+    def draw_portals(self, scene: Scene, camera: Camera) -> None:
+        """ draw only what can be seen from the camera's sector """
+
+        #frames drawn between ticks can leave the camera a step 
+        # behind the player, maybe in the sector they just left
+        start = scene.spatial_index.sector_at(camera.position) or scene.player.sector
+        rooms = tuple((room, room.generation) for room in scene.active_rooms)
+        doors = tuple(door.is_open for room, _ in rooms for door in room.doors)
+
+        def project() -> tuple:
+            visible = find_visible_sectors(camera, start)
+            walls, edge_tables, spans, culled = project_visible_walls(visible, camera)
+            return list(visible), *self.occlude(walls, edge_tables, spans), culled
+
+        sectors, walls, columns, occluded, culled = camera.cached(
+            ("portals", start, rooms, doors, self.occlusion), project)
+        self.columns = columns
+        self.cull_stats["walls"] += culled
+        self.cull_stats["occluded"] += occluded
+        self.cull_stats["drawn"] += len(walls)
+
+        for wall, edge_table in walls:
+            color = "green"
+            if isinstance(wall, Door):
+                color = "cyan" if wall.is_open else "yellow"
+            self.create_polygon(edge_table, color, wall)
+
+        drakes = scene.drakes
+        self.draw_entities(
+            drakes, drakes.in_sectors([sector.index for sector in sectors]), camera)
+
+    def occlude(self, 
+        walls: list[Wall], edge_tables: np.ndarray, 
+        spans: np.ndarray) -> tuple[list[tuple[Wall, list[ivec2]]], ColumnBuffer, int]:
+        """ drop hidden walls, if occluding, leaving the nearest first """
+
+        if not self.occlusion:
+            return list(zip(walls, edge_tables.tolist())), None, 0
+
+        columns = ColumnBuffer()
+        rows = occlude_walls(walls, spans, columns)
+        return (
+            [(walls[row], edge_table) for row, edge_table in 
+                zip(rows.tolist(), edge_tables[rows].tolist())],
+            columns, len(walls) - rows.shape[0])
+
+    def sectors_in_view(self, scene: Scene, camera: Camera) -> list[int]:
+        """ rows of the active sectors whose bounds reach into the view """
+
+        def cull() -> tuple[list[int], int]:
+            rows = np.array(
+                [row for room in scene.active_rooms for row in room.sector_rows], 
+                dtype = int)
+            inside = rects_in_frustum(scene.level.sector_rects[rows], camera)
+            return rows[inside].tolist(), int(rows.shape[0] - inside.sum())
+
+        rooms = tuple(scene.active_rooms)
+        rows, culled = camera.cached(("sectors in view", scene.level, rooms), cull)
+        self.cull_stats["sectors"] += culled
+        return rows
+
+    def draw_rooms(self, scene: Scene, camera: Camera) -> None:
+        """ draw everything in the active rooms """
+
+        if self.batched:
+            self.draw_walls_batched(scene.active_rooms, camera)
+
+        for room in scene.active_rooms:
+            
+            if not self.batched:
+                self.draw_walls(room, camera)
+            
+                self.draw_doors(room, camera)
+
+        drakes = scene.drakes
+        self.draw_entities(drakes, drakes.in_sectors(self.sectors_in_view(scene, camera)), camera)
     
     def draw_walls(self, 
-        room: Room, camera: Player) -> None:
+        room: Room, camera: Camera) -> None:
 
         for sector in room.sectors:
+                if camera.frustum_code(sector.pos_a) & camera.frustum_code(sector.pos_b) \
+                    & camera.frustum_code(sector.pos_c) & camera.frustum_code(sector.pos_d):
+                    self.cull_stats["walls"] += len(sector.walls)
+                    continue
                 color = "green"
                 for wall in sector.walls:
                     self.draw_wall(wall, color, camera)
     
     def draw_doors(self,
-        room: Room, camera: Player) -> None:
+        room: Room, camera: Camera) -> None:
 
         for door in room.doors:
 
@@ -874,127 +3934,224 @@ class GameView(tk.Canvas):
             
             self.draw_wall(door, color, camera)
     
-    def draw_wall(self, wall: Wall, color: str, camera: Player) -> None:
+    def get_wall_table(self, rooms: list[Room]) -> WallTable:
+        """ merged walls and doors of the active rooms, kept until they change """
+
+        if self._wall_table is None:
+            self._wall_table = WallTable.merge([room.getWallTable() for room in rooms])
+        return self._wall_table
+
+    def watch(self, scene: Scene) -> None:
+        """ hear about the scene's room changes, from the first frame built of it """
+
+        if self.scene is not scene:
+            self.scene = scene
+            self._wall_table = None
+            scene.subscribe_rooms(self.rooms_changed)
+
+    def rooms_changed(self, activated: list[Room], deactivated: list[Room]) -> None:
+
+        self._wall_table = None
 
-        camera_position = camera.get_position()
-        camera_direction = camera.direction
-        camera_z = camera.get_top()
+    def draw_walls_batched(self, 
+        rooms: list[Room], camera: Camera) -> None:
+
+        table = self.get_wall_table(rooms)
+
+        def project() -> tuple:
+            rows = walls_in_frustum(table, camera)
+            indices, edge_tables, spans = project_walls(table.take(rows), camera, spans = True)
+            walls = [table.walls[row] for row in rows[indices].tolist()]
+            return *self.occlude(walls, edge_tables, spans), len(table) - rows.shape[0]
+
+        doors = tuple(wall.is_open for wall in table.walls if isinstance(wall, Door))
+        projected, columns, occluded, culled = camera.cached(
+            ("game walls", table, doors, self.occlusion), project)
+        self.columns = columns
+        self.cull_stats["walls"] += culled
+        self.cull_stats["occluded"] += occluded
+        self.cull_stats["drawn"] += len(projected)
+        for wall, edge_table in projected:
+            color = "green"
+            if isinstance(wall, Door):
+                color = "cyan" if wall.is_open else "yellow"
+            self.create_polygon(edge_table, color, wall)
+
+    def draw_wall(self, wall: Wall, color: str, camera: Camera) -> None:
 
         #backface test
         wall_pos = (-wall.pos_a[0], -wall.pos_a[1])
-        wall_to_viewer = translate(camera_position, wall_pos)
+        wall_to_viewer = translate(camera.position, wall_pos)
         if (dot_product(wall_to_viewer, wall.normal) < 0)\
             and not wall.backface_visible:
             return
 
-        pos_a = world_to_view_transform(
-            wall.pos_a, camera_position, camera_direction)
+        if camera.frustum_code(wall.pos_a) & camera.frustum_code(wall.pos_b):
+            self.cull_stats["walls"] += 1
+            return
+
+        pos_a = camera.to_view(wall.pos_a)
                     
-        pos_b = world_to_view_transform(
-            wall.pos_b, camera_position, camera_direction)
+        pos_b = camera.to_view(wall.pos_b)
 
         edge_table = view_to_screen_transform(
             pos_a, pos_b, 
-            wall.z, wall.z + wall.height, camera_z
+            wall.z, wall.z + wall.height, camera.z
         )
 
         if edge_table is None:
             return
 
-        self.create_polygon(edge_table, color)
+        self.cull_stats["drawn"] += 1
+        self.create_polygon(edge_table, color, wall)
     
-    def draw_entity(self, entity: Entity, camera: Player) -> None:
+    def draw_entities(self, 
+        pool: EntityPool, slots: np.ndarray, camera: Camera) -> None:
+        """ draw the drakes in the given pool slots, all projected together """
 
-        camera_position = camera.get_position()
-        camera_direction = camera.direction
-        camera_z = camera.get_top()
+        columns = self.columns
 
-        pos = world_to_view_transform(
-                entity.get_position(), camera_position, camera_direction)
-        
-        edge_table = []
-        size = entity.get_size()
-        scale = (size/2, size/2, size/2)
-
-        color = DRAKE_COLORS[DRAKE_BODY]
-        for line_segment in DRAKE_MODEL[DRAKE_BODY]:
-            pos_a, pos_b = line_segment
-
-            new_points = view_to_screen_transform_simple(
-                pos_a = (scale[0]*(pos_a[0]) + pos[0], scale[0]*(pos_a[1]) + pos[1]), 
-                pos_b = (scale[1]*(pos_b[0]) + pos[0], scale[1]*(pos_b[1]) + pos[1]), 
-                z_a = scale[2]*(pos_a[2]), z_b = scale[2]*(pos_b[2]), z_camera=camera_z
-            )
+        def project() -> tuple[list[tuple[str, np.ndarray, np.ndarray]], int, int]:
+            inside = instances_in_frustum(DRAKE_MESH, pool, slots, camera)
+            shown = inside
+            if columns is not None:
+                shown = instances_unoccluded(DRAKE_MESH, pool, inside, camera, columns)
+            return (
+                project_instances(DRAKE_MESH, pool, shown, camera, keys = True), 
+                slots.shape[0] - inside.shape[0], inside.shape[0] - shown.shape[0])
 
-            if new_points is None:
-                continue
+        lines, culled, occluded = camera.cached(
+            ("drakes", pool, pool.revision, slots.tobytes(), columns), project)
+        self.cull_stats["drakes"] += culled
+        self.cull_stats["occluded"] += occluded
 
-            for point in new_points:
-                edge_table.append(point)
+        for color, table, keys in lines:
+            self.commands.add_lines(table, color, display_key(KEY_DRAKE, keys))
 
-        if len(edge_table) == 0:
-            return
+    def create_polygon(self, edge_table: list[ivec2], color: str, wall: Wall) -> None:
 
-        self.create_polygon(edge_table, color)
+        key = display_key(KEY_WALL, wall.key*WALL_KEY_LINES)
+        line_count = len(edge_table)
+        for i in range(line_count):
+            pos_a = edge_table[i]
+            pos_b = edge_table[(i + 1) % line_count]
 
-        edge_table = []
-        color = DRAKE_COLORS[DRAKE_FACE]
-        for line_segment in DRAKE_MODEL[DRAKE_FACE]:
-            pos_a, pos_b = line_segment
+            self.commands.line(pos_a[0], pos_a[1], pos_b[0], pos_b[1], color, key + i)
+#endregion
+################ Control   ####################################################
+#region
+class FixedTimestep:
+    """
+        Turns real time into a whole number of simulation ticks.
 
-            new_points = view_to_screen_transform_simple(
-                pos_a = (scale[0]*(pos_a[0]) + pos[0], scale[0]*(pos_a[1]) + pos[1]), 
-                pos_b = (scale[1]*(pos_b[0]) + pos[0], scale[1]*(pos_b[1]) + pos[1]), 
-                z_a = scale[2]*(pos_a[2]), z_b = scale[2]*(pos_b[2]), z_camera=camera_z
-            )
+        Time left over carries into the next frame, and how far it
+        is into the next tick is what rendering interpolates by.
+        Frames that overrun their schedule by more than they can 
+        catch up on drop the extra time, so the game slows down 
+        rather than spiralling.
+    """
 
-            if new_points is None:
-                continue
+    def __init__(self, 
+        clock: Callable[[], float] = time.perf_counter, 
+        tick_rate: float = TICK_RATE, max_ticks: int = MAX_CATCH_UP_TICKS):
+
+        self.clock = clock
+        self.step = 1 / tick_rate
+        self.max_ticks = max_ticks
+        self.last = clock()
+        self.accumulator = 0.0
+        #seconds thrown away by the catch up cap
+        self.dropped = 0.0
+    
+    def advance(self, interval: float = 0.0) -> int:
+        """ ticks to run this frame, scheduled interval seconds after the last """
+
+        now = self.clock()
+        self.accumulator += now - self.last
+        self.last = now
+
+        ticks = int(self.accumulator / self.step)
+        most = self.max_ticks + int(interval / self.step)
+        if ticks > most:
+            ticks = most
+            behind = self.accumulator - ticks*self.step
+            self.dropped += behind - behind % self.step
+            self.accumulator = behind % self.step
+        else:
+            self.accumulator -= ticks*self.step
+        return ticks
+    
+    def alpha(self) -> float:
+        """ how far into the next tick we are, 0 to 1 """
 
-            for point in new_points:
-                edge_table.append(point)
+        return min(self.accumulator / self.step, 1.0)
 
-        if len(edge_table) == 0:
-            return
+class FramePipeline:
+    """
+        Splits drawing into building display lists, which needs no 
+        Tk, and submitting them, which has to happen on the main 
+        thread. With a worker, frame N+1 is built while frame N is 
+        submitted, so what's on screen runs a frame behind.
 
-        self.create_polygon(edge_table, color)
+        Nothing may change the scene while a build is running: 
+        finish() first.
+    """
 
-        color = DRAKE_COLORS[DRAKE_MISC]
-        for line_segment in DRAKE_MODEL[DRAKE_MISC]:
-            pos_a, pos_b = line_segment
+    def __init__(self, views: list, threaded: bool = PIPELINED_BUILD):
 
-            edge_table = view_to_screen_transform_simple(
-                pos_a = (scale[0]*(pos_a[0]) + pos[0], scale[0]*(pos_a[1]) + pos[1]), 
-                pos_b = (scale[1]*(pos_b[0]) + pos[0], scale[1]*(pos_b[1]) + pos[1]), 
-                z_a = scale[2]*(pos_a[2]), z_b = scale[2]*(pos_b[2]), z_camera=camera_z
-            )
+        self.views = views
+        self.worker = ThreadPoolExecutor(max_workers = 1) if threaded else None
+        self.building: Future = None
+        #display lists built and not yet submitted, 
+        # and how many ms building them took
+        self.ready: list[DisplayList] = None
+        self.build_time = 0.0
 
-            if not edge_table is None:
-                self.create_polygon(edge_table, color)
-    
-    def create_polygon(self, edge_table: list[ivec2], color: str) -> None:
+    def build(self, scene: Scene, camera: Camera) -> tuple[list[DisplayList], float]:
 
-        line_count = len(edge_table)
-        for i in range(line_count):
-            pos_a = edge_table[i]
-            pos_b = edge_table[(i + 1) % line_count]
+        start = time.perf_counter()
+        commands = [view.build(scene, camera) for view in self.views]
+        return commands, 1000*(time.perf_counter() - start)
+
+    def start(self, scene: Scene, camera: Camera) -> None:
+        """ build a frame, in the background if there's a worker """
+
+        self.finish()
+        if self.worker is None:
+            self.ready, self.build_time = self.build(scene, camera)
+        else:
+            self.building = self.worker.submit(self.build, scene, camera)
+
+    def finish(self) -> None:
+        """ wait for the frame being built, if any """
+
+        if self.building is not None:
+            self.ready, self.build_time = self.building.result()
+            self.building = None
+
+    def take(self) -> list[DisplayList] | None:
+        """ the frame ready to submit, one per view, if there is one """
+
+        commands = self.ready
+        self.ready = None
+        return commands
 
-            self.create_line(pos_a[0], pos_a[1], pos_b[0], pos_b[1], fill = color)
-#endregion
-################ Control   ####################################################
-#region
 class App:
 
-    def __init__(self, root: tk.Tk):
+    def __init__(self, root: tk.Tk, clock: Callable[[], float] = time.perf_counter):
 
         self.root = root
 
         self.game_frame = tk.Frame(self.root)
         if MODE < 2:
-            self.map_view = MapView(self.game_frame, width = SCREEN_WIDTH, height = SCREEN_HEIGHT)
-            self.map_view.pack(side=tk.LEFT)
-        self.projected_view = GameView(self.game_frame, width=SCREEN_WIDTH, height = SCREEN_HEIGHT)
-        self.projected_view.pack(side=tk.LEFT)
+            self.map_view = MapView(tk.Canvas(
+                self.game_frame, bg="black", 
+                width = SCREEN_WIDTH, height = SCREEN_HEIGHT))
+            self.map_view.canvas.pack(side=tk.LEFT)
+        self.projected_view = GameView(tk.Canvas(
+            self.game_frame, bg="black", 
+            width = SCREEN_WIDTH, height = SCREEN_HEIGHT))
+        self.projected_view.canvas.pack(side=tk.LEFT)
         self.game_frame.pack(side=tk.TOP)
 
         if MODE == 0:
@@ -1002,8 +4159,22 @@ class App:
             self.status_bar.pack(side=tk.TOP)
         
         self.scene = Scene("level.txt")
+        self.camera: Camera = None
+
+        #the player's pose before and after the last tick, 
+        # frames are drawn in between
+        self.timestep = FixedTimestep(clock)
+        self.pose = Camera.player_pose(self.scene.player)
+        self.previous_pose = self.pose
+
+        self.profiler = FrameProfiler()
+        views = [self.map_view, self.projected_view] if MODE < 2 else [self.projected_view]
+        self.pipeline = FramePipeline(views)
 
         self.keys_down = {}
+        self.trigger_pulled = False
+        self.interval = FRAME_INTERVAL
+        self.after_id = None
 
         self.bind_events()
     
@@ -1014,7 +4185,24 @@ class App:
     
     def handle_key_press(self, event) -> None:
 
+        if self.interval > FRAME_INTERVAL:
+            #wake up from idle now rather than at the next slow tick. 
+            # The ticks slept through run first, so the key doesn't 
+            # count for the time before it was pressed
+            self.root.after_cancel(self.after_id)
+            self.pipeline.finish()
+            self.run_ticks(self.timestep.advance(self.interval / 1000), playing = False)
+            self.interval = FRAME_INTERVAL
+            self.after_id = self.root.after_idle(self.update)
+
         self.keys_down[event.keysym] = True
+        #fired on the next tick, while nothing is reading the scene
+        if event.keysym == "space":
+            self.trigger_pulled = True
+
+        if event.keysym == "F2" and MODE == 0:
+            self.profiler.export_csv(PROFILE_EXPORT + ".csv")
+            self.profiler.export_json(PROFILE_EXPORT + ".json")
     
     def handle_key_release(self, event) -> None:
 
@@ -1030,25 +4218,107 @@ class App:
             self.scene.move_player(1)
         if "Down" in self.keys_down and self.keys_down["Down"]:
             self.scene.move_player(-1)
+        if self.trigger_pulled:
+            self.scene.fire()
+            self.trigger_pulled = False
     
+    def tick(self, playing: bool = True) -> None:
+        """ one fixed step of the game, reading the keys if playing """
+
+        if playing:
+            with self.profiler.stage("input"):
+                self.handle_key_state()
+
+        with self.profiler.stage("scene"):
+            self.scene.update()
+
+    def run_ticks(self, ticks: int, playing: bool = True) -> None:
+
+        for _ in range(ticks):
+            self.tick(playing)
+            self.previous_pose = self.pose
+            self.pose = Camera.player_pose(self.scene.player)
+
     def update(self) -> None:
 
-        self.handle_key_state()
+        profiler = self.profiler
+        profiler.begin_frame()
+
+        #the scene is read by the frame being built
+        with profiler.stage("wait for build"):
+            self.pipeline.finish()
+
+        #this frame was scheduled self.interval after the last one
+        ticks = self.timestep.advance(self.interval / 1000)
+        profiler.count("ticks", ticks)
+        self.run_ticks(ticks)
+        profiler.count("drakes thought", self.scene.ai_stats["thought"])
+
+        pose = Camera.interpolate(self.previous_pose, self.pose, self.timestep.alpha())
+        moving = self.camera is None or pose != self.camera.pose
+
+        changed = self.scene.dirty or moving
+        if changed or self.scene.wandered:
+            if changed:
+                self.interval = FRAME_INTERVAL
+            self.scene.dirty = False
+            self.scene.wandered = False
+            self.redraw(pose)
+
+        #this frame if building in the foreground, the last one if not
+        drawn = self.pipeline.ready is not None
+        if drawn:
+            self.present()
+            with profiler.stage("idle flush"):
+                self.root.update_idletasks()
+        if not changed and not any(self.keys_down.values()):
+            #nothing to show and nobody playing, back off
+            self.interval = min(2*self.interval, IDLE_INTERVAL)
+        
+        #frames that draw nothing would only flatter the percentiles
+        profiler.end_frame(keep = drawn)
+        self.after_id = self.root.after(self.interval, self.update)
+
+    def redraw(self, pose: tuple[vec2, float, float] = None) -> None:
+        """ start drawing the player's view from pose, by default where they are now """
 
-        self.scene.update()
+        if pose is None:
+            pose = Camera.player_pose(self.scene.player)
+        self.camera = Camera.from_pose(pose, self.camera)
+        self.pipeline.start(self.scene, self.camera)
+
+    def present(self) -> None:
+        """ hand the frame the pipeline has ready to Tk """
+
+        profiler = self.profiler
+        pipeline = self.pipeline
+        commands = pipeline.take()
+        profiler.count("build", pipeline.build_time)
 
         if MODE==0:
-            self.status_bar.redraw(self.scene)
-        
-        if MODE < 2:
-            self.map_view.redraw(self.scene)
-        
-        self.projected_view.redraw(self.scene)
-        
-        self.root.after(16, self.update)
+            with profiler.stage("status bar"):
+                self.status_bar.redraw(self.scene, profiler)
+
+        for view, view_commands in zip(pipeline.views, commands):
+            name = "game view" if view is self.projected_view else "map view"
+            with profiler.stage(name):
+                view.submit(view_commands)
+
+        stats = commands[-1].stats
+        profiler.count("walls drawn", stats["drawn"])
+        profiler.count("walls culled", stats["walls"])
+        profiler.count("occluded", stats["occluded"])
+        profiler.count("drakes culled", stats["drakes"])
+        profiler.count("canvas items", sum(sum(v.pool.used.values()) for v in pipeline.views))
+        profiler.count("tcl calls", sum(v.pool.stats["tcl calls"] for v in pipeline.views))
 #endregion
 ###############################################################################
-root = tk.Tk()
-app = App(root)
-app.update()
-root.mainloop()
\ No newline at end of file
+def main() -> None:
+
+    root = tk.Tk()
+    app = App(root)
+    app.update()
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
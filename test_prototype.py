@@ -0,0 +1,145 @@
+"""
+    Regression tests for the 3D Game
+"""
+import os
+import random
+
+import numpy as np
+import pytest
+
+import prototype
+from benchmark import generate_level
+from prototype import Camera, GameView, HeadlessCanvas, Scene
+
+
+@pytest.fixture
+def grid_scene(tmp_path) -> Scene:
+    """ a 4 by 4 room level, the player starting on a sector boundary at x = 96 """
+
+    filename = os.path.join(tmp_path, "grid_4x4.txt")
+    generate_level(filename, 4, 4)
+    random.seed(0)
+    scene = Scene(filename, use_cache = False)
+    scene.update()
+    return scene
+
+
+@pytest.mark.parametrize("direction", [0, 90, 180, 270])
+def test_portals_on_sector_boundary(grid_scene: Scene, direction: float):
+    """ standing on a portal, facing across it or along it, hides nothing """
+
+    scene = grid_scene
+    assert scene.player.get_position()[0] == 96
+    scene.player.direction = direction
+    camera = Camera.from_player(scene.player)
+
+    portal = GameView(HeadlessCanvas(), portals = True)
+    batched = GameView(HeadlessCanvas(), portals = False)
+    portal.build(scene, camera)
+    batched.build(scene, camera)
+    assert portal.cull_stats["drawn"] == batched.cull_stats["drawn"]
+
+
+def test_portal_under_camera_is_full_window(grid_scene: Scene):
+    """ the sector across a portal the camera stands on is seen through the whole screen """
+
+    scene = grid_scene
+    scene.player.direction = 0
+    camera = Camera.from_player(scene.player)
+    start = scene.player.sector
+    visible = prototype.find_visible_sectors(camera, start)
+    assert visible[start.getNeighbour("cd")] == (0, prototype.SCREEN_WIDTH)
+
+
+def add_drakes(scene: Scene, count: int) -> None:
+    """ count drakes spread over the player's room """
+
+    sectors = scene.player.room.sectors
+    for _ in range(count):
+        sector = random.choice(sectors)
+        scene.drakes.allocate(
+            sector.pos_a[0] + random.uniform(0, sector.size[0]),
+            sector.pos_a[1] + random.uniform(0, sector.size[1]),
+            0, 40, 12, sector.index)
+
+
+def test_drakes_take_turns_with_no_ai_budget(grid_scene: Scene):
+    """ with no time to spare the drakes, near or not, still all get a turn """
+
+    scene = grid_scene
+    add_drakes(scene, 200)
+    slots = scene.active_drakes()
+    scene.ai_budget = 0.0
+    (close, rest) = scene.ai_queues()
+    assert close.shape[0] > 0
+    for _ in range(-(-max(close.shape[0], rest.shape[0]) // prototype.AI_MIN_BATCH)):
+        scene.frame += 1
+        scene.update_drakes()
+        assert scene.ai_stats["thought"] == \
+            min(close.shape[0], prototype.AI_MIN_BATCH) + min(rest.shape[0], prototype.AI_MIN_BATCH)
+    assert (scene.drakes.thought[slots] >= 0).all()
+
+    scene.ai_budget = float("inf")
+    scene.update_drakes()
+    assert scene.ai_stats == {"thought": slots.shape[0], "waiting": 0}
+
+
+def test_wandering_drakes_do_not_wake_an_idle_game(tmp_path):
+    """ drakes wandering out of sight change nothing, in sight they only count as wandering """
+
+    filename = os.path.join(tmp_path, "hall.txt")
+    generate_level(filename, 1, 1, 40, 40)
+    random.seed(0)
+    scene = Scene(filename, use_cache = False)
+    scene.drakes.release(scene.drakes.live_slots())
+    scene.update()
+
+    #far enough off that nobody notices the player
+    (x, y) = scene.player.get_position()
+    spots = np.array([(x + 600, y), (x - 600, y), (x, y + 600), (x, y - 600)])
+    sectors = scene.sector_map.locate(spots[:,0], spots[:,1])
+    codes = Camera.from_player(scene.player).frustum_codes(spots[:,0], spots[:,1])
+    for in_sight in (False, True):
+        scene.drakes.release(scene.drakes.live_slots())
+        spot = np.flatnonzero((codes == 0) == in_sight)[0]
+        scene.drakes.allocate(spots[spot, 0], spots[spot, 1], 0, 40, 12, int(sectors[spot]))
+        scene.update()
+        (scene.dirty, scene.wandered) = (False, False)
+
+        scene.update()
+        assert not scene.dirty
+        assert scene.wandered == in_sight
+
+
+def test_idle_frames_keep_the_simulation_in_time():
+    """ a frame on its idle schedule runs every tick due, only an overrun drops time """
+
+    now = [0.0]
+    timestep = prototype.FixedTimestep(lambda: now[0])
+    idle = prototype.IDLE_INTERVAL / 1000
+    ticks = 0
+    for _ in range(40):
+        now[0] += idle
+        ticks += timestep.advance(idle)
+    assert ticks == round(40*idle*prototype.TICK_RATE)
+    assert timestep.dropped == 0
+
+    now[0] += 10*idle
+    assert timestep.advance(idle) == prototype.MAX_CATCH_UP_TICKS + int(idle*prototype.TICK_RATE)
+    assert timestep.dropped > 0
+
+
+@pytest.mark.parametrize("pixels", [
+    np.linspace(20, 200, 50), 
+    np.concatenate(([300.0], np.linspace(5, 60, 500)))])
+def test_detail_levels_spend_line_budget_nearest_first(pixels: np.ndarray):
+    """ over the budget, detail drops a level at a time from the smallest drake up """
+
+    mesh = prototype.DRAKE_MESH
+    levels = mesh.detail_levels(pixels)
+    assert mesh.lod_lines[levels].sum() <= mesh.line_budget
+    #never coarser for a bigger drake
+    by_size = levels[np.argsort(-pixels, kind = "stable")]
+    assert (np.diff(by_size) >= 0).all()
+    assert by_size[0] < len(mesh.lods) - 1
+    assert len(np.unique(levels)) >= 3